@@ -9,90 +9,59 @@ Usage:
 Notes:
 - The script respects robots.txt for the user-agent " * ".
 - Keep `max_pages` reasonable to avoid heavy crawling.
+- `--concurrency N` fetches with N workers; `--rate R` caps requests/second per host
+  (defaults to one request every `--delay` seconds, i.e. the old sequential budget).
+- `--export-md [PATH]` writes a Markmap outline; for big sites, `--md-split-sections`,
+  `--md-max-level` and `--md-max-nodes` keep each file small enough to open in a browser.
 - The public PlantUML server is used for convenience; for heavy or repeated use, host your own PlantUML server.
 """
 
+import os
+import re
 import sys
+import json
 import time
+import asyncio
+import functools
+import logging
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urljoin
-import urllib.robotparser
-import zlib
-
-# ---------- PlantUML encoding (from PlantUML docs) ----------
-def encode6bit(b: int) -> str:
-    if b < 10:
-        return chr(48 + b)
-    b -= 10
-    if b < 26:
-        return chr(65 + b)
-    b -= 26
-    if b < 26:
-        return chr(97 + b)
-    b -= 26
-    if b == 0:
-        return "-"
-    if b == 1:
-        return "_"
-    return "?"
-
-def append3bytes(b1: int, b2: int, b3: int) -> str:
-    c1 = b1 >> 2
-    c2 = ((b1 & 0x3) << 4) | (b2 >> 4)
-    c3 = ((b2 & 0xF) << 2) | (b3 >> 6)
-    c4 = b3 & 0x3F
-    r = ""
-    r += encode6bit(c1 & 0x3F)
-    r += encode6bit(c2 & 0x3F)
-    r += encode6bit(c3 & 0x3F)
-    r += encode6bit(c4 & 0x3F)
-    return r
-
-def encode64(data: bytes) -> str:
-    res = ""
-    i = 0
-    length = len(data)
-    while i < length:
-        if i + 2 == length:
-            res += append3bytes(data[i], data[i + 1], 0)
-        elif i + 1 == length:
-            res += append3bytes(data[i], 0, 0)
-        else:
-            res += append3bytes(data[i], data[i + 1], data[i + 2])
-        i += 3
-    return res
 
-def plantuml_encode(text: str) -> str:
-    compressed = zlib.compress(text.encode("utf-8"))[2:-4]
-    return encode64(compressed)
+from plantuml_encoding import plantuml_encode
+from plantuml_render import RENDERERS, RenderCache, ServerRenderer, get_renderer, render_diagrams
+from politeness import HostScheduler
+from robots_cache import RobotsCache
+from frontier import Frontier, ORDERS
+from crawl_loop import CrawlLoop
+from page_extract import BACKENDS, extract_page
+from http_cache import ResponseCache, content_hash
+from site_diff import diff_site_maps
+from crawl_output import CrawlJournal, is_stream_path
+from site_graph import SiteGraph
+from mindmap_export import form_texts, shared_texts
+from shared_components import SharedComponents
+from crawl_metrics import LOG_LEVELS, CrawlMetrics, configure_logging
+from dedup import PageDeduplicator, UrlCanonicalizer, collapse_site_map, html_fingerprint
+from parse_pool import InOrder, ParsePool
+from sitemap_discovery import SitemapReader
+
+log = logging.getLogger(__name__)
 
 # ---------- Crawler + parser ----------
 HEADERS = {
     "User-Agent": "site-mindmap-bot/1.0 (+https://example.com/contact)"
 }
 
-def allowed_to_crawl(base_url: str, path: str) -> bool:
-    rp = urllib.robotparser.RobotFileParser()
-    robots_url = urljoin(base_url, "/robots.txt")
-    try:
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch("*", path)
-    except Exception:
-        # If robots can't be fetched, be conservative: allow (or you can return False)
-        return False
-
-def extract_headings(html: str):
-    soup = BeautifulSoup(html, "html.parser")
-    headings = []
-    for level in range(1, 7):
-        for tag in soup.find_all(f"h{level}"):
-            text = tag.get_text(separator=" ", strip=True)
-            if text:
-                headings.append((level, text))
-    return headings
+_robots = RobotsCache()
+
+def allowed_to_crawl(base_url: str, path: str, robots: RobotsCache = None) -> bool:
+    """robots.txt check; rules are fetched once per origin and cached (see robots_cache.py)."""
+    return (robots or _robots).can_fetch(urljoin(base_url, path))
+
+def extract_headings(html: str, backend: str = "auto"):
+    return extract_page(html, backend)["headings"]
 
 def canonicalize_link(link: str, base_domain: str):
     if not link:
@@ -108,149 +77,651 @@ def canonicalize_link(link: str, base_domain: str):
     # relative
     return None
 
-def crawl_site(start_url: str, max_pages: int = 200, delay: float = 0.5):
-    parsed_start = urlparse(start_url)
-    base_domain = parsed_start.netloc
-    base_url_root = f"{parsed_start.scheme}://{base_domain}"
-
-    to_visit = [start_url.rstrip('/')]
-    visited = set()
-    site_map = {}   # url -> {"title":..., "headings":[(level,text)], "links":[...]}
-    while to_visit and len(visited) < max_pages:
-        url = to_visit.pop(0)
-        if url in visited:
-            continue
-
-        path = urlparse(url).path or "/"
-        if not allowed_to_crawl(base_url_root, path):
-            print(f"[robots.txt] Skipping disallowed: {url}")
-            visited.add(url)
-            continue
+def make_session(pool_size: int = 10) -> requests.Session:
+    """A pooled HTTP session shared by all crawl workers (keep-alive per host)."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(HEADERS)
+    return session
+
+def parse_page(html: str, url: str, base_domain: str, backend: str = "auto", canonicalize=None) -> dict:
+    # one parse gives title, headings and links (see page_extract.py)
+    page = extract_page(html, backend)
+
+    # collect internal links
+    links = set()
+    for href in page["links"]:
+        # make absolute
+        if canonicalize is None:
+            full = urljoin(url, href.split('?')[0]).split('#')[0].rstrip('/')
+        else:
+            # keeps the query so tracking and print-view parameters can be told apart
+            full = canonicalize(href, base=url)
+        parsed_full = urlparse(full)
+        if parsed_full.netloc.endswith(base_domain):
+            links.add(full)
+
+    record = {
+        "title": page["title"] or url,
+        "headings": page["headings"],
+        "links": sorted(list(links))
+    }
+    if page["canonical"]:
+        record["canonical"] = page["canonical"]  # popped by the crawler, see dedup.py
+    return record
+
+def crawl_site(start_url: str, max_pages: int = 200, delay: float = 0.5, **options):
+    """Crawl `start_url` and return the site map. See `crawl_site_async` for `options`."""
+    return asyncio.run(crawl_site_async(start_url, max_pages=max_pages, delay=delay, **options))
+
+def cached_record(entry: dict) -> dict:
+    record = dict(entry["record"])
+    record["headings"] = [tuple(h) for h in record.get("headings", [])]
+    return record
+
+async def crawl_site_async(start_url: str, max_pages: int = 200, delay: float = 0.5,
+                           concurrency: int = 1, rate: float = None, order: str = "bfs",
+                           parser: str = "auto", cache_dir: str = None,
+                           stream_out: str = None, resume: bool = False, checkpoint_every: int = 50,
+                           graph: SiteGraph = None, dedup: bool = False, metrics: CrawlMetrics = None,
+                           parse_workers: int = 0, sitemap: bool = False):
+    """
+    `concurrency` workers share one pooled session; each host is limited to `rate`
+    requests/second (default: one request every `delay` seconds). `order` is the
+    frontier order: "bfs", "dfs" or "best-first" (shallowest URL first). `parser` is
+    the page_extract backend ("auto" picks the fastest installed one). With
+    `cache_dir`, pages are fetched with conditional GETs and unchanged pages reuse
+    the record extracted on a previous crawl (see http_cache.py).
 
-        try:
-            print(f"[crawl] GET {url}")
-            resp = requests.get(url, headers=HEADERS, timeout=15)
-        except Exception as e:
-            print(f"[error] fetching {url} => {e}")
-            visited.add(url)
-            time.sleep(delay)
-            continue
+    With `stream_out` (a .jsonl path) every page is appended to the stream as soon as
+    it is parsed and the frontier is checkpointed every `checkpoint_every` pages;
+    `resume=True` continues an interrupted crawl from that stream + checkpoint.
 
-        if resp.status_code != 200:
-            print(f"[status] {resp.status_code} for {url}")
-            visited.add(url)
-            time.sleep(delay)
-            continue
+    Pages are also added to `graph` (a site_graph.SiteGraph), with their crawl parent.
 
-        html = resp.text
-        soup = BeautifulSoup(html, "html.parser")
+    `dedup` merges URL aliases and duplicate pages (dedup.py); off by default, the CLI opts in.
 
-        title_tag = soup.find("title")
-        title = title_tag.get_text(strip=True) if title_tag else url
+    With `parse_workers`, pages are parsed (headings, links, the near-duplicate
+    fingerprint) in that many processes while the workers keep fetching; at most
+    2 * `parse_workers` raw pages wait for a parser and parsed pages are applied in
+    fetch order (see parse_pool.py). 0 parses in the crawler's own process.
 
-        headings = extract_headings(html)
+    With `sitemap`, the frontier is also seeded with the URLs of the site's sitemaps
+    (robots.txt `Sitemap:` lines and /sitemap.xml, see sitemap_discovery.py), which
+    finds pages no link leads to. With `cache_dir` as well, a sitemap page whose
+    `<lastmod>` is older than its cached fetch is not fetched again.
 
-        # collect internal links
-        links = set()
-        for a in soup.find_all("a", href=True):
-            href = a.get("href").split('?')[0]
-            # make absolute
-            full = urljoin(url, href).split('#')[0].rstrip('/')
-            parsed_full = urlparse(full)
-            if parsed_full.netloc.endswith(base_domain):
-                links.add(full)
-
-        site_map[url] = {
-            "title": title,
-            "headings": headings,
-            "links": sorted(list(links))
-        }
+    `metrics` is a crawl_metrics.CrawlMetrics.
+    """
+    metrics = metrics or CrawlMetrics()
+    parsed_start = urlparse(start_url)
+    base_domain = parsed_start.netloc
 
-        visited.add(url)
-        # enqueue new links
-        for l in sorted(links):
-            if l not in visited and l not in to_visit and len(visited) + len(to_visit) < max_pages:
-                to_visit.append(l)
+    if rate is None and delay > 0:
+        rate = 1.0 / delay
+    scheduler = HostScheduler(rate=rate)
+    session = make_session(concurrency)
+    robots = RobotsCache(session=session)
+    cache = ResponseCache(cache_dir) if cache_dir else None
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    loop = asyncio.get_running_loop()
+    deduper = PageDeduplicator(start_url) if dedup else None
+    canonicalize = deduper.canonicalize if deduper else None
+    pool = ParsePool(functools.partial(parse_page, base_domain=base_domain, backend=parser, canonicalize=canonicalize),
+                     html_fingerprint if deduper else None, workers=parse_workers)
+    turns = InOrder()
+
+    journal = CrawlJournal(stream_out, resume=resume, every=checkpoint_every) if stream_out else None
+    crawl = CrawlLoop(Frontier(order=order), max_pages, journal=journal, deduper=deduper, graph=graph,
+                      metrics=metrics, limit="urls", keep=True)
+    # url -> {"title":..., "headings":[(level,text)], "links":[...]}
+    site_map = crawl.site_map
+
+    lastmods = {}  # sitemap URL -> <lastmod>, for pages that have a cache entry to compare with
+
+    def wait_for_host(url, crawl_delay):
+        """`scheduler.wait` for the sitemap reader, which runs on the thread pool."""
+        async def wait():
+            scheduler.apply_crawl_delay(urlparse(url).netloc, crawl_delay)
+            with metrics.timer("politeness_wait"):
+                await scheduler.wait(url)
+        asyncio.run_coroutine_threadsafe(wait(), loop).result()
+
+    def seed_from_sitemaps():
+        reader = SitemapReader(session=session, robots=robots, wait=wait_for_host)
+        seeded = 0
+        for loc, lastmod in reader.discover(start_url):
+            if crawl.full():
+                break
+            # like links, see parse_page
+            url = canonicalize(loc) if canonicalize else loc.split('?')[0].split('#')[0].rstrip('/')
+            if not urlparse(url).netloc.endswith(base_domain):
+                continue
+            if crawl.frontier.push(url, depth=1):
+                seeded += 1
+                if lastmod is not None and cache:
+                    lastmods[url] = lastmod
+        log.info("[sitemap] seeded %s URLs %s", seeded, reader.stats())
+        metrics.incr("sitemap_seeded", seeded)
+
+    async def unchanged_since_crawl(url):
+        """The cache entry of a sitemap page not modified since it was fetched, or None."""
+        lastmod = lastmods.pop(url, None)
+        if lastmod is None:
+            return None
+        with metrics.timer("cache_io"):
+            entry = await loop.run_in_executor(executor, cache.get, url)
+        if entry and entry.get("fetched_at", 0) >= lastmod:
+            return entry
+        return None
 
-        time.sleep(delay)
+    def fetch(url):
+        entry = cache.get(url) if cache else None
+        t0 = time.perf_counter()
+        resp = session.get(url, headers=ResponseCache.conditional_headers(entry), timeout=15)
+        total = time.perf_counter() - t0
+        # requests reads the whole body in get(); `elapsed` stops at the response headers
+        ttfb = resp.elapsed.total_seconds()
+        metrics.observe("ttfb", ttfb)
+        metrics.observe("download", max(0.0, total - ttfb))
+        metrics.response(resp.status_code, len(resp.content))
+        return resp, entry
+
+    async def visit(url, parent, depth):  # see crawl_loop.CrawlLoop.run
+        # may fetch robots.txt on a cache miss, so it runs on the thread pool
+        with metrics.timer("robots"):
+            allowed, crawl_delay = await loop.run_in_executor(executor, robots.check, url)
+        if not allowed:
+            log.info("[robots.txt] Skipping disallowed: %s", url)
+            metrics.incr("robots_disallowed")
+            return
+        scheduler.apply_crawl_delay(urlparse(url).netloc, crawl_delay)
+
+        entry = await unchanged_since_crawl(url)
+        if entry:
+            log.info("[sitemap] unchanged since the last crawl: %s", url)
+            metrics.incr("sitemap_unchanged")
+            resp = None
+        else:
+            with metrics.timer("politeness_wait"):
+                await scheduler.wait(url)
+            try:
+                log.info("[crawl] GET %s", url)
+                resp, entry = await loop.run_in_executor(executor, fetch, url)
+            except Exception as e:
+                log.error("[error] fetching %s => %s", url, e)
+                metrics.incr("fetch_errors")
+                return
+
+            if resp.status_code == 304 and entry:
+                log.info("[cache] not modified: %s", url)
+                cache.not_modified += 1
+                metrics.incr("cache_not_modified")
+            elif resp.status_code != 200:
+                log.warning("[status] %s for %s", resp.status_code, url)
+                return
+
+        # pages are parsed concurrently but applied in the order they were fetched
+        ticket = turns.ticket()
+        try:
+            page, fingerprint = await load(url, resp, entry)
+            await turns.wait(ticket)
+            apply(url, page, fingerprint, resp)
+        finally:
+            turns.release(ticket)
+
+    async def parse(url, resp):
+        t0 = time.perf_counter()
+        page, fingerprint, seconds = await pool.parse(resp.content, resp.encoding or resp.apparent_encoding, url)
+        metrics.observe("parse", seconds)
+        if pool.workers:
+            metrics.observe("parse_wait", max(0.0, time.perf_counter() - t0 - seconds))
+            if deduper:  # the workers' canonicalizer does not know the aliases learned since
+                aliases = deduper.canonicalize.aliases
+                page["links"] = sorted({aliases.get(l, l) for l in page["links"]})
+        return page, fingerprint
+
+    async def load(url, resp, entry):
+        """`(record, fingerprint or None)` of a fetched page, from the cache or the parser."""
+        if resp is None:  # not fetched, see unchanged_since_crawl
+            return cached_record(entry), None
+        if resp.status_code == 304:
+            page, fingerprint = cached_record(entry), None
+            with metrics.timer("cache_io"):
+                await loop.run_in_executor(executor, cache.refresh, url, entry, resp)
+        elif cache is None:
+            page, fingerprint = await parse(url, resp)
+        else:
+            digest = content_hash(resp.content)
+            if entry and entry.get("content_hash") == digest:
+                log.info("[cache] unchanged: %s", url)
+                cache.unchanged += 1
+                metrics.incr("cache_unchanged")
+                page, fingerprint = cached_record(entry), None
+                with metrics.timer("cache_io"):
+                    await loop.run_in_executor(executor, cache.refresh, url, entry, resp)
+            else:
+                cache.misses += 1
+                page, fingerprint = await parse(url, resp)
+                with metrics.timer("cache_io"):
+                    await loop.run_in_executor(executor, cache.put, url, resp, digest, page)
+        return page, fingerprint
+
+    def apply(url, page, fingerprint, resp):
+        declared = page.pop("canonical", None)
+        if deduper and resp is not None and resp.status_code == 200:
+            fingerprint = fingerprint or html_fingerprint(resp.text)
+        else:
+            fingerprint = None  # a cached page was checked when it was first crawled
+        key = crawl.admit(url, declared, fingerprint=fingerprint)
+        if key:
+            crawl.store(url, page, key)
+
+    crawl.start(canonicalize(start_url) if canonicalize else start_url.rstrip('/'))
+    for page in site_map.values():  # replayed from the stream
+        page["headings"] = [tuple(h) for h in page.get("headings", [])]
+    try:
+        if sitemap:
+            with metrics.timer("sitemap"):
+                await loop.run_in_executor(executor, seed_from_sitemaps)
+        async with pool:
+            await crawl.run(visit, concurrency)
+    finally:
+        executor.shutdown(wait=False)
+        session.close()
+        crawl.close()
+        metrics.finish()
+
+    if graph is not None and (resume or sitemap):
+        # the stream does not record parents of replayed pages, sitemap seeds have none
+        graph.infer_parents()
+
+    log.info("[robots.txt] cache %s", robots.stats())
+    if deduper:
+        log.info("[dedup] %s", deduper.stats())
+    if cache:
+        log.info("[cache] %s", cache.stats())
+    metrics.log_summary(log)
 
     return site_map
 
 # ---------- Build PlantUML mindmap ----------
-def build_mindmap_chunks(site_map: dict, root_name: str = "Site", chunk_size: int = 20):
+# Budgets per chunk: encoded diagram length (what goes into the server URL) and
+# number of nodes (what drives render time / diagram readability).
+MAX_ENCODED_CHARS = 6000
+MAX_CHUNK_NODES = 400
+
+def page_block(url: str, meta: dict, max_nodes: int = None, shared: SharedComponents = None,
+               record: bool = True):
+    """
+    PlantUML lines for one page (depth 2), its headings and forms (Playwright-schema
+    pages). With `shared`, forms in the shared components are replaced by one
+    "Uses: F1, F2" line, counted in `shared`'s report unless `record` is False.
+    With `max_nodes`, headings and then form lines beyond the budget are cut and
+    summarized in one "… N more" line.
+    """
+    title = meta.get("title") or url
+    safe_title = f"{title} — {url}"
+    lines = ["** " + escape_plantuml(safe_title)]
+    # Add headings as children
+    headings = [f"{'*' * (3 + min(level - 1, 3))} {escape_plantuml(text)}"  # reasonable depth
+                for level, text in meta.get("headings", [])]
+    forms = meta.get("forms", [])
+    labels = []
+    if shared:
+        labels, unshared = shared.page_refs(forms, meta.get("links", []))
+        if labels and record:
+            shared.references += 1
+            shared.replaced_lines += sum(len(form_texts(f)) for f in forms if f not in unshared)
+        forms = unshared
+    form_lines = [f"{'*' * (depth + 3)} {escape_plantuml(text)}"
+                  for form in forms for depth, text in form_texts(form)]
+    details = headings + form_lines
+    room = None if max_nodes is None else max(0, max_nodes - 2 - bool(labels))  # title, "… more", "Uses"
+    if room is not None and len(details) > room:
+        hidden_headings = max(0, len(headings) - room)
+        hidden_forms = len(details) - room - hidden_headings
+        lines.extend(details[:room])
+        lines.append("*** … " + ", ".join(f"{n} more {what}" for n, what in
+                                          ((hidden_headings, "headings"), (hidden_forms, "form lines")) if n))
+    else:
+        lines.extend(details)
+    if labels:
+        lines.append("*** Uses: " + ", ".join(labels))
+    return lines
+
+def _path_segments(url: str):
+    return [seg for seg in urlparse(url).path.split("/") if seg]
+
+def _subtree_units(pages, level: int, max_encoded: int, max_nodes: int):
+    """
+    Split URL-sorted `(url, encoded_size, nodes)` pages into units that each fit
+    the budgets, keeping pages that share a path prefix (up to `level` segments)
+    together for as long as possible.
+    """
+    size = sum(p[1] for p in pages)
+    nodes = sum(p[2] for p in pages)
+    if (size <= max_encoded and nodes <= max_nodes) or len(pages) == 1:
+        return [pages]
+    groups = {}
+    for page in pages:
+        segs = _path_segments(page[0])
+        groups.setdefault(segs[level] if len(segs) > level else None, []).append(page)
+    if len(groups) == 1 and None in groups:
+        # nothing deeper to split on: one unit per page
+        return [[p] for p in pages]
+    units = []
+    for group in groups.values():
+        units.extend(_subtree_units(group, level + 1, max_encoded, max_nodes))
+    # keep URL order across groups
+    units.sort(key=lambda unit: unit[0][0])
+    return units
+
+def _section(url: str) -> str:
+    segs = _path_segments(url)
+    return "/" + segs[0] if segs else "/"
+
+def _fit_lines(lines, max_encoded: int, max_nodes: int):
+    """`lines` cut to the budgets; the cut-off part becomes one "… N more" line at its depth."""
+    if len(lines) <= 1 or (len(lines) <= max_nodes and len(plantuml_encode("\n".join(lines))) <= max_encoded):
+        return lines
+    lo, hi = 1, min(len(lines), max_nodes) - 1  # at least the head line, and room for the marker
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if len(plantuml_encode("\n".join(lines[:mid]))) + 64 <= max_encoded:
+            lo = mid
+        else:
+            hi = mid - 1
+    stars = lines[lo].split(" ", 1)[0]
+    return lines[:lo] + [f"{stars} … {len(lines) - lo} more"]
+
+def _pack_diagrams(blocks, max_encoded: int, max_nodes: int):
+    """
+    Greedily pack `(key, lines)` blocks into groups whose lines fit the budgets; a
+    block too big on its own is cut (see `_fit_lines`). Returns lists of blocks.
+    """
+    groups, current, size, nodes = [], [], 0, 0
+    for key, lines in blocks:
+        lines = _fit_lines(lines, max_encoded, max_nodes)
+        block_size = len(plantuml_encode("\n".join(lines)))
+        if current and (size + block_size > max_encoded or nodes + len(lines) > max_nodes):
+            groups.append(current)
+            current, size, nodes = [], 0, 0
+        current.append((key, lines))
+        size += block_size
+        nodes += len(lines)
+    if current:
+        groups.append(current)
+    return groups
+
+def build_mindmap_chunks(site_map: dict, root_name: str = "Site", chunk_size: int = None,
+                         max_encoded: int = MAX_ENCODED_CHARS, max_nodes: int = MAX_CHUNK_NODES,
+                         index: bool = True, svg_prefix: str = "mindmap", shared: bool = True,
+                         metrics: CrawlMetrics = None):
     """
     Build multiple PlantUML mindmap chunks to avoid hitting PlantUML server URL size limits.
-    Each chunk will contain up to `chunk_size` pages.
+    Pages are packed (in URL order) until a chunk would exceed `max_encoded` encoded
+    characters or `max_nodes` nodes (or `chunk_size` pages, if given); pages under the
+    same URL path are kept in the same chunk whenever that subtree fits. A page that is
+    too big on its own gets its headings, then its form lines truncated.
+    With `index`, a "mindmap_index.puml" overview linking to every chunk's SVG
+    (`<svg_prefix>_<n>.svg`) is appended. It lists each part's URL sections only as
+    far as the budgets allow; if even the part links do not fit, the index is split
+    into "mindmap_index_2.puml", ...
+    With `shared`, forms found on several pages are emitted once in a "Shared
+    components" branch (in the single chunk if it fits, else in "mindmap_shared.puml",
+    "mindmap_shared_2.puml", ... within the same budgets) and pages reference them.
+    Link sets are not factored here since the chunks do not draw links.
     Returns a list of (filename, plantuml_text).
+    `site_map` may be a lazy JsonlSiteMap: only the current chunk's pages are loaded.
+    Sizing encodes are timed as the "encode" stage of `metrics`.
     """
-    pages = sorted(site_map.items(), key=lambda x: x[0])
-    chunks = [pages[i:i + chunk_size] for i in range(0, len(pages), chunk_size)]
-    
-    outputs = []
+    root_name = escape_plantuml(root_name)
+    overhead = len(plantuml_encode(f"@startmindmap\n* {root_name}\n@endmindmap"))
+    page_budget = max(1, max_encoded - overhead)
+    node_budget = max(3, max_nodes - 1)
+
+    components = None
+    if shared:
+        components = SharedComponents.detect(
+            (url, meta.get("forms", []), ()) for url, meta in site_map.items())
+    branch = [f"{'*' * (depth + 2)} {escape_plantuml(text)}" for depth, text in shared_texts(components)]
+
+    # pass 1: only sizes are kept in memory
+    pages = []
+    for url in sorted(site_map):
+        block = page_block(url, site_map[url], max_nodes=node_budget, shared=components, record=False)
+        t0 = time.perf_counter()
+        encoded_size = len(plantuml_encode("\n".join(block)))
+        if metrics is not None:
+            metrics.observe("encode", time.perf_counter() - t0)
+        pages.append((url, encoded_size, len(block)))
+
+    chunks, current, size, nodes = [], [], 0, 0
+
+    def fits(extra_size, extra_nodes, extra_pages):
+        return (size + extra_size <= page_budget and nodes + extra_nodes <= node_budget
+                and not (chunk_size and len(current) + extra_pages > chunk_size))
+
+    for unit in _subtree_units(pages, 0, page_budget, node_budget):
+        # a subtree starts a new chunk rather than straddle two
+        if current and not fits(sum(p[1] for p in unit), sum(p[2] for p in unit), len(unit)):
+            chunks.append(current)
+            current, size, nodes = [], 0, 0
+        for url, page_size, page_nodes in unit:
+            # only a unit bigger than a whole chunk is split
+            if current and not fits(page_size, page_nodes, 1):
+                chunks.append(current)
+                current, size, nodes = [], 0, 0
+            current.append(url)
+            size += page_size
+            nodes += page_nodes
+    if current:
+        chunks.append(current)
+
+    # the branch goes into a lone chunk only if both still fit its budgets
+    inline = branch and len(chunks) == 1 and nodes + len(branch) <= node_budget and (
+        size + len(plantuml_encode("\n".join(branch))) <= page_budget)
+    definition_lines = len(branch)
+
+    # pass 2: render each chunk's text
+    outputs, total_lines = [], 0
     for idx, chunk in enumerate(chunks, 1):
         lines = ["@startmindmap", "* " + root_name]
-        for url, meta in chunk:
-            title = meta.get("title") or url
-            safe_title = f"{title} — {url}"
-            lines.append("** " + escape_plantuml(safe_title))
-            # Add headings as children
-            for level, text in meta.get("headings", []):
-                indent = "*" * (3 + min(level - 1, 3))  # reasonable depth
-                lines.append(f"{indent} {escape_plantuml(text)}")
+        if inline:
+            lines.extend(branch)
+        for url in chunk:
+            lines.extend(page_block(url, site_map[url], max_nodes=node_budget, shared=components))
         lines.append("@endmindmap")
+        total_lines += len(lines)
         outputs.append((f"mindmap_{idx}.puml", "\n".join(lines)))
+    if branch and not inline:
+        # one block per component (the lines under "** Shared components"), split over diagrams as needed
+        blocks = []
+        for line in branch[1:]:
+            if line.startswith("*** ") or not blocks:
+                blocks.append((None, []))
+            blocks[-1][1].append(line)
+        groups = _pack_diagrams(blocks, page_budget - len(plantuml_encode(branch[0])), node_budget - 1)
+        definition_lines = 0
+        for n, group in enumerate(groups, 1):
+            head = branch[0] + (f" ({n}/{len(groups)})" if len(groups) > 1 else "")
+            lines = ["@startmindmap", "* " + root_name, head, *(l for _, block in group for l in block), "@endmindmap"]
+            total_lines += len(lines)
+            definition_lines += len(lines)
+            outputs.append((f"mindmap_shared{f'_{n}' if n > 1 else ''}.puml", "\n".join(lines)))
+
+    if index and len(chunks) > 1:
+        sections = []
+        for chunk in chunks:
+            counts = {}
+            for url in chunk:
+                counts[_section(url)] = counts.get(_section(url), 0) + 1
+            sections.append(counts)
+
+        def entry(idx, cap):
+            """Index lines of part `idx`: its link and up to `cap` section lines."""
+            chunk, counts = chunks[idx - 1], sections[idx - 1]
+            plural = "s" if len(chunk) != 1 else ""
+            more = len(counts) - cap
+            head = f"** [[{svg_prefix}_{idx}.svg Part {idx}]] ({len(chunk)} page{plural}"
+            head += f", {len(counts)} section{'s' if len(counts) != 1 else ''})" if more > 0 else ")"
+            lines = [head] + [f"*** {escape_plantuml(section)} ({count})"
+                              for section, count in list(counts.items())[:cap]]
+            if more > 0 and cap:
+                lines.append(f"*** … {more} more sections")
+            return lines
+
+        # as many section lines per part as one index can hold; else several indexes of part links
+        groups = None
+        for cap in range(max(map(len, sections)), -1, -1):
+            blocks = [(idx, entry(idx, cap)) for idx in range(1, len(chunks) + 1)]
+            if sum(len(lines) for _, lines in blocks) > node_budget:
+                continue
+            if sum(len(plantuml_encode("\n".join(lines))) for _, lines in blocks) <= page_budget:
+                groups = [blocks]
+                break
+        if groups is None:
+            groups = _pack_diagrams([(idx, entry(idx, 0)) for idx in range(1, len(chunks) + 1)],
+                                    page_budget - 64, node_budget)
+        for n, group in enumerate(groups, 1):
+            root = root_name
+            if len(groups) > 1:
+                root += f" (parts {group[0][0]}–{group[-1][0]} of {len(chunks)})"
+            lines = ["@startmindmap", "* " + root, *(l for _, block in group for l in block), "@endmindmap"]
+            outputs.append((f"mindmap_index{f'_{n}' if n > 1 else ''}.puml", "\n".join(lines)))
+    if components:
+        log.info(components.report(total_lines, definition_lines))
     return outputs
 
-# ---------- Fetch PlantUML server with chunks ----------
-def fetch_plantuml_chunks(chunks, output_prefix="mindmap"):
-    for puml_file, plantuml_text in chunks:
-        encoded = plantuml_encode(plantuml_text)
-        url = f"http://www.plantuml.com/plantuml/svg/{encoded}"
-        print(f"[plantuml] requesting {url[:120]}...")  # truncate log
-        resp = requests.get(url, headers=HEADERS, timeout=30)
-        if resp.status_code == 200:
-            svg_file = puml_file.replace(".puml", ".svg").replace("mindmap", output_prefix)
-            with open(svg_file, "wb") as f:
-                f.write(resp.content)
-            print(f"[ok] saved SVG to {svg_file}")
-        else:
-            print(f"[error] PlantUML server returned {resp.status_code}: {resp.text[:200]}")
+# ---------- Render PlantUML chunks ----------
+def fetch_plantuml_chunks(chunks, output_prefix="mindmap", renderer=None, cache=None, max_workers=4,
+                          metrics=None):
+    """
+    Render every chunk to SVG. Chunks render in parallel; with a RenderCache,
+    chunks whose encoded diagram was rendered before are not sent again.
+    """
+    own_renderer = renderer is None
+    renderer = renderer or ServerRenderer(headers=HEADERS)
+    try:
+        log.info("[plantuml] rendering %s chunks with the %s renderer", len(chunks), renderer.name)
+        results = render_diagrams([text for _, text in chunks], renderer, cache=cache, max_workers=max_workers,
+                                  metrics=metrics)
+    finally:
+        if own_renderer:
+            renderer.close()
+    for (puml_file, _), result in zip(chunks, results):
+        if isinstance(result, Exception):
+            log.error("[error] %s: %s", puml_file, result)
+            continue
+        svg_file = puml_file.replace(".puml", ".svg").replace("mindmap", output_prefix)
+        with open(svg_file, "wb") as f:
+            f.write(result)
+        log.info("[ok] saved SVG to %s", svg_file)
+    if cache is not None:
+        log.info("[plantuml] render cache %s", cache.stats())
 
 def escape_plantuml(s: str) -> str:
     # PlantUML mindmap nodes are plain text; replace newlines and some control chars
     return s.replace("\n", " ").replace("\r", " ").strip()
 
-# ---------- Request PlantUML server ----------
-def fetch_plantuml_svg(plantuml_text: str, out_file: str = "mindmap.svg"):
-    encoded = plantuml_encode(plantuml_text)
-    url = f"http://www.plantuml.com/plantuml/svg/{encoded}"
-    print(f"[plantuml] requesting {url}")
-    resp = requests.get(url, headers=HEADERS, timeout=30)
-    if resp.status_code == 200:
-        with open(out_file, "wb") as f:
-            f.write(resp.content)
-        print(f"[ok] saved SVG to {out_file}")
-    else:
-        print(f"[error] PlantUML server returned {resp.status_code}: {resp.text[:200]}")
+# ---------- Render a single diagram ----------
+def fetch_plantuml_svg(plantuml_text: str, out_file: str = "mindmap.svg", renderer=None, cache=None,
+                       metrics=None):
+    own_renderer = renderer is None
+    renderer = renderer or ServerRenderer(headers=HEADERS)
+    try:
+        result = render_diagrams([plantuml_text], renderer, cache=cache, max_workers=1, metrics=metrics)[0]
+    finally:
+        if own_renderer:
+            renderer.close()
+    if isinstance(result, Exception):
+        log.error("[error] %s", result)
+        return
+    with open(out_file, "wb") as f:
+        f.write(result)
+    log.info("[ok] saved SVG to %s", out_file)
 
 # ---------- Optional: export markdown for Markmap ----------
-def export_markmap_markdown(site_map: dict, out_file: str = "structure.md"):
+def url_section(url: str) -> str:
+    """Top-level section of a URL: its first path segment ("" for the home page)."""
+    segments = [p for p in urlparse(url).path.split("/") if p]
+    return segments[0] if segments else ""
+
+def section_file(out_file: str, section: str, taken: set = None) -> str:
+    """
+    `structure.md` + "blog" -> `structure_blog.md`; the home page ("") gets
+    `structure_home.md`. Slugs already in `taken` (compared case-insensitively)
+    get a counter, so "/home", "/a b" and "/a-b" each keep a file of their own.
+    """
+    root, ext = os.path.splitext(out_file)
+    base = re.sub(r"[^A-Za-z0-9_-]+", "-", section).strip("-") if section else "home"
+    slug, n = base or "section", 1
+    if taken is not None:
+        while slug.lower() in taken:
+            n += 1
+            slug = f"{base or 'section'}-{n}"
+        taken.add(slug.lower())
+    return f"{root}_{slug}{ext or '.md'}"
+
+def write_markdown_page(f, url: str, meta: dict, max_level: int = None, max_nodes: int = None):
+    """One page's `## title` block; headings deeper than `max_level` are left out."""
+    f.write(f"\n## {meta.get('title') or url}\n- URL: {url}\n")
+    headings = [(level, text) for level, text in meta.get("headings", [])
+                if max_level is None or level <= max_level]
+    shown = headings if max_nodes is None else headings[:max_nodes]
+    for level, text in shown:
+        f.write(f"{'  ' * (level - 1)}- {text}\n")
+    if len(shown) < len(headings):
+        f.write(f"- … {len(headings) - len(shown)} more headings\n")
+
+def export_markmap_markdown(site_map: dict, out_file: str = "structure.md", split_sections: bool = False,
+                            max_level: int = None, max_nodes: int = None) -> list:
     """
     Create a Markdown outline from the site map suitable for markmap.
+    Pages are written one at a time, so a lazy JsonlSiteMap is never fully loaded.
+
+    `max_level` drops headings below h<max_level> and `max_nodes` caps the headings
+    shown per page, so the outline of a big site stays loadable in a browser. With
+    `split_sections`, each top-level URL section (/blog/..., /docs/...) gets its own
+    file next to `out_file`, and `out_file` becomes an index of them. Returns the
+    files written.
     """
-    lines = ["# Site Structure"]
-    for url, meta in sorted(site_map.items(), key=lambda x: x[0]):
-        title = meta.get("title") or url
-        lines.append(f"## {title}")
-        lines.append(f"- URL: {url}")
-        for level, text in meta.get("headings", []):
-            indent = "  " * (level - 1)
-            lines.append(f"{indent}- {text}")
-        lines.append("")  # blank line
-    md = "\n".join(lines)
+    if not split_sections:
+        with open(out_file, "w", encoding="utf-8") as f:
+            f.write("# Site Structure")
+            for url in sorted(site_map):
+                write_markdown_page(f, url, site_map[url], max_level, max_nodes)
+        log.info("[ok] saved markdown to %s", out_file)
+        return [out_file]
+
+    # sorted by section, so one section file is open at a time
+    sections, f, taken = [], None, set()
+    try:
+        for url in sorted(site_map, key=lambda u: (url_section(u), u)):
+            section = url_section(url)
+            if not sections or sections[-1][0] != section:
+                if f:
+                    f.close()
+                path = section_file(out_file, section, taken)
+                f = open(path, "w", encoding="utf-8")
+                f.write(f"# {'/' + section if section else 'Home'}")
+                sections.append([section, path, 0])
+            write_markdown_page(f, url, site_map[url], max_level, max_nodes)
+            sections[-1][2] += 1
+    finally:
+        if f:
+            f.close()
+
     with open(out_file, "w", encoding="utf-8") as f:
-        f.write(md)
-    print(f"[ok] saved markdown to {out_file}")
+        f.write("# Site Structure\n")
+        for section, path, pages in sections:
+            rel = os.path.relpath(path, os.path.dirname(out_file) or ".")
+            f.write(f"- [{'/' + section if section else 'Home'}]({rel}) ({pages} pages)\n")
+    log.info("[ok] saved markdown index to %s and %s section files", out_file, len(sections))
+    return [out_file] + [path for _, path, _ in sections]
 
 # ---------- CLI ----------
 def main():
@@ -258,29 +729,123 @@ def main():
     parser.add_argument("start_url", help="Start URL (e.g. https://teamupventures.com/)")
     parser.add_argument("--max-pages", type=int, default=100, help="Maximum pages to crawl")
     parser.add_argument("--delay", type=float, default=0.6, help="Delay (seconds) between requests")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of parallel fetch workers")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Max requests/second per host (default: 1 / --delay)")
+    parser.add_argument("--order", choices=ORDERS, default="bfs", help="Crawl order of the frontier")
+    parser.add_argument("--parser", choices=["auto", *BACKENDS], default="auto",
+                        help="HTML parser backend (auto = fastest installed)")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="Processes parsing pages while fetching continues (0 = parse in-process)")
+    parser.add_argument("--sitemap", action="store_true",
+                        help="Also seed the crawl from robots.txt Sitemap: entries and /sitemap.xml")
     parser.add_argument("--output", default="mindmap.svg", help="Output SVG filename prefix")
-    parser.add_argument("--export-md", action="store_true", help="Also export markdown suitable for Markmap")
+    parser.add_argument("--export-md", nargs="?", const="structure.md", default=None, metavar="PATH",
+                        help="Also export markdown suitable for Markmap (default path: structure.md)")
+    parser.add_argument("--md-split-sections", action="store_true",
+                        help="One markdown file per top-level URL section, plus an index")
+    parser.add_argument("--md-max-level", type=int, default=None, help="Deepest heading level in the markdown")
+    parser.add_argument("--md-max-nodes", type=int, default=None, help="Max headings per page in the markdown")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Keep URL aliases (index.php, print views, tracking params) and near-duplicate pages")
+    parser.add_argument("--json-out", default=None,
+                        help="Also save the crawled site map as JSON; a .jsonl path streams each page "
+                             "as it is crawled and checkpoints the frontier")
+    parser.add_argument("--graph-out", default=None,
+                        help="Also save the crawl as a site graph (convert with mindmap_export.py)")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted .jsonl crawl")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="Pages between checkpoints")
+    parser.add_argument("--cache-dir", default=None,
+                        help="On-disk HTTP cache for conditional re-crawls (default with --incremental: .crawl_cache)")
+    parser.add_argument("--incremental", metavar="PREVIOUS_JSON", default=None,
+                        help="Compare against a previous crawl's JSON and only write the diff")
+    parser.add_argument("--diff-out", default="site_diff.json", help="Diff output file for --incremental")
+    parser.add_argument("--chunk-chars", type=int, default=MAX_ENCODED_CHARS,
+                        help="Max encoded PlantUML characters per chunk (server URL budget)")
+    parser.add_argument("--chunk-nodes", type=int, default=MAX_CHUNK_NODES, help="Max nodes per chunk")
+    parser.add_argument("--no-shared", action="store_true",
+                        help="Repeat shared forms on every page instead of a 'Shared components' branch")
+    parser.add_argument("--renderer", choices=sorted(RENDERERS), default="server",
+                        help="PlantUML renderer: public/own server, local plantuml.jar, or offline stub")
+    parser.add_argument("--plantuml-server", default=None, help="PlantUML server URL for --renderer server")
+    parser.add_argument("--plantuml-jar", default="plantuml.jar", help="plantuml.jar for --renderer local")
+    parser.add_argument("--render-cache", default=None, help="Directory of already rendered diagrams")
+    parser.add_argument("--render-workers", type=int, default=4, help="Chunks rendered in parallel")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO", help="Logging verbosity")
+    parser.add_argument("--report", nargs="?", const="crawl_report.json", default=None, metavar="PATH",
+                        help="Write a JSON run report: stage timings, status codes, bytes, queue depth, pages/s"
+                             " (default path: crawl_report.json)")
+    parser.add_argument("--prometheus", default=None, help="Also write the metrics in Prometheus text format")
     args = parser.parse_args()
+    configure_logging(args.log_level)
+    metrics = CrawlMetrics()
+    if args.incremental and not args.cache_dir:
+        args.cache_dir = ".crawl_cache"
 
     start_url = args.start_url.rstrip('/')
-    print(f"[start] crawling {start_url} (max_pages={args.max_pages})")
-
-    site_map = crawl_site(start_url, max_pages=args.max_pages, delay=args.delay)
-    print(f"[done] crawled {len(site_map)} pages")
+    log.info("[start] crawling %s (max_pages=%s, concurrency=%s)", start_url, args.max_pages, args.concurrency)
+    graph = SiteGraph() if args.graph_out else None
+
+    site_map = crawl_site(start_url, max_pages=args.max_pages, delay=args.delay,
+                          concurrency=args.concurrency, rate=args.rate, order=args.order, parser=args.parser,
+                          cache_dir=args.cache_dir,
+                          stream_out=args.json_out if is_stream_path(args.json_out) else None,
+                          resume=args.resume, checkpoint_every=args.checkpoint_every, graph=graph,
+                          dedup=not args.no_dedup, metrics=metrics, parse_workers=args.parse_workers,
+                          sitemap=args.sitemap)
+    log.info("[done] crawled %s pages", len(site_map))
+
+    if graph is not None:
+        graph.save(args.graph_out)
+        log.info("[ok] saved site graph (%s urls) to %s", len(graph.urls), args.graph_out)
+
+    if args.json_out and not is_stream_path(args.json_out):
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(site_map, f, indent=2)
+        log.info("[ok] saved site map to %s", args.json_out)
+
+    if args.incremental:
+        with open(args.incremental, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        if not args.no_dedup:
+            # an older crawl may predate dedup: compare pages under their canonical URLs
+            previous, _ = collapse_site_map(previous, UrlCanonicalizer(start_url))
+        diff = diff_site_maps(previous, site_map)
+        with open(args.diff_out, "w", encoding="utf-8") as f:
+            json.dump(diff, f, indent=2)
+        log.info("[ok] %s added, %s removed, %s changed pages -> %s",
+                 len(diff["added"]), len(diff["removed"]), len(diff["changed"]), args.diff_out)
+        metrics.write(args.report, args.prometheus)
+        return
 
     # Build chunked PlantUMLs
-    chunks = build_mindmap_chunks(site_map, root_name=start_url, chunk_size=20)
+    chunks = build_mindmap_chunks(site_map, root_name=start_url, max_encoded=args.chunk_chars,
+                                  max_nodes=args.chunk_nodes, svg_prefix=args.output.replace(".svg", ""),
+                                  shared=not args.no_shared, metrics=metrics)
 
     # Save PUML sources + fetch SVGs
     for puml_file, plantuml_text in chunks:
         with open(puml_file, "w", encoding="utf-8") as f:
             f.write(plantuml_text)
-        print(f"[ok] saved PlantUML source to {puml_file}")
-
-    fetch_plantuml_chunks(chunks, output_prefix=args.output.replace(".svg", ""))
+        log.info("[ok] saved PlantUML source to %s", puml_file)
+
+    if args.renderer == "server":
+        renderer_options = {"headers": HEADERS}
+        if args.plantuml_server:
+            renderer_options["base_url"] = args.plantuml_server
+    elif args.renderer == "local":
+        renderer_options = {"jar": args.plantuml_jar}
+    else:
+        renderer_options = {}
+    cache = RenderCache(args.render_cache) if args.render_cache else None
+    with get_renderer(args.renderer, **renderer_options) as renderer:
+        fetch_plantuml_chunks(chunks, output_prefix=args.output.replace(".svg", ""),
+                              renderer=renderer, cache=cache, max_workers=args.render_workers, metrics=metrics)
 
     if args.export_md:
-        export_markmap_markdown(site_map, out_file="structure.md")
+        export_markmap_markdown(site_map, out_file=args.export_md, split_sections=args.md_split_sections,
+                                max_level=args.md_max_level, max_nodes=args.md_max_nodes)
+    metrics.write(args.report, args.prometheus)
         
 if __name__ == "__main__":
     main()
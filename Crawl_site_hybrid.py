@@ -0,0 +1,322 @@
+"""
+Hybrid crawl: every page is fetched with requests and parsed statically first
+(page_extract.py); only pages that look like they need JavaScript are loaded again
+in a pooled headless Chromium (Crawl_site_playwright.TabPool). The browser is only
+launched once the first page escalates, so a fully static site never starts it.
+
+A page escalates when its static HTML has
+- an empty body:  fewer than `min_words` words of visible text
+- an SPA marker:  an empty app root (`<div id="root">`, `ng-app`, `__NEXT_DATA__`, ...)
+                  or a "please enable JavaScript" notice, with under `spa_words` words
+- no links:       no same-site link at all (a script builds the navigation)
+
+The output is the Playwright crawler's schema ({url: {"title", "url", "parent",
+"links", "forms"}}, forms included), so json_to_plantuml, mindmap_export and
+site_graph read it unchanged. The run report counts the pages rendered in the
+browser, overall ("escalated") and per reason ("escalated_empty_body", ...), the
+render attempts that failed ("render_errors", the static page is kept) and the
+pages left static because the browser could not be started ("escalation_skipped").
+
+    python Crawl_site_hybrid.py https://example.com/ --max-pages 200 --browser-tabs 2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from playwright.async_api import async_playwright
+
+from Crawl_site_BeautifulSoup import make_session
+from Crawl_site_playwright import TabPool, extract_page_info, internal_links, json_to_plantuml
+from crawl_metrics import LOG_LEVELS, CrawlMetrics, configure_logging
+from crawl_loop import CrawlLoop
+from crawl_output import CrawlJournal, is_stream_path
+from dedup import PageDeduplicator, visible_text, words_of
+from frontier import Frontier
+from mindmap_export import FORM_MODES
+from page_extract import BACKENDS, extract_forms, extract_page
+from politeness import HostScheduler
+from robots_cache import RobotsCache
+from site_graph import SiteGraph
+
+log = logging.getLogger(__name__)
+
+START_URL = "https://www.340bpriceguide.net/"
+MAX_PAGES = 50
+CONCURRENCY = 4   # static fetch workers (--concurrency)
+BROWSER_TABS = 2  # tabs for escalated pages (--browser-tabs)
+
+# markup of client-rendered apps: an empty mount point or a framework's bootstrap data
+SPA_MARKERS = re.compile(
+    r"<div[^>]+id=[\"'](?:root|app|__next|__nuxt)[\"'][^>]*>\s*</div>"
+    r"|\bng-app\b|\bng-version=|\bdata-reactroot\b|__NEXT_DATA__|window\.__NUXT__"
+    r"|<noscript[^>]*>[^<]*(?:enable|requires?)\s+javascript",
+    re.I)
+
+
+def escalation_reason(html: str, words: int, links, min_words: int = 30, spa_words: int = 200):
+    """Why a statically parsed page needs the browser ("empty body", "spa marker", "no links"), or None."""
+    if words < min_words:
+        return "empty body"
+    if words < spa_words and SPA_MARKERS.search(html):
+        return "spa marker"
+    if not links:
+        return "no links"
+    return None
+
+
+class Browser:
+    """
+    TabPool started on first use; `render(url)` is Crawl_site_playwright's extraction.
+    If Chromium cannot be started, `failed` keeps the error, whatever was started is
+    stopped again and the browser stays off for the rest of the crawl.
+    """
+
+    def __init__(self, tabs: int = BROWSER_TABS, block_resources: bool = True):
+        self.tabs = tabs
+        self.block_resources = block_resources
+        self.failed = None
+        self._playwright = None
+        self._browser = None
+        self._pool = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.failed is None
+
+    async def _start(self):
+        async with self._lock:
+            if self.failed is not None:
+                raise RuntimeError(f"browser unavailable: {self.failed}")
+            if self._pool is None:
+                log.info("[hybrid] launching Chromium (%s tabs)", self.tabs)
+                try:
+                    self._playwright = await async_playwright().start()
+                    self._browser = await self._playwright.chromium.launch(headless=True)
+                    self._pool = await TabPool(self._browser, size=self.tabs,
+                                               block_resources=self.block_resources).start()
+                except Exception as e:
+                    self.failed = e
+                    log.error("[hybrid] Chromium failed to start (%s); pages stay static from now on", e)
+                    await self.close()
+                    raise
+        return self._pool
+
+    async def render(self, url, base_domain, metrics, canonicalize=None):
+        """`(status, (title, links, forms, canonical, text, timing))` of `url` loaded in a tab."""
+        pool = await self._start()
+        page = await pool.acquire()
+        try:
+            with metrics.timer("navigate"):
+                response = await page.goto(url, timeout=30000)
+            with metrics.timer("extract"):
+                info = await extract_page_info(page, url, base_domain, canonicalize)
+            return (response.status if response else None), info
+        finally:
+            pool.release(page)
+
+    async def close(self):
+        """Stop whatever was started, each part on its own (a failed launch leaves no pool)."""
+        pool, browser, playwright = self._pool, self._browser, self._playwright
+        self._pool = self._browser = self._playwright = None
+        for part, stop in ((pool, "close"), (browser, "close"), (playwright, "stop")):
+            if part is None:
+                continue
+            try:
+                await getattr(part, stop)()
+            except Exception as e:
+                log.warning("[hybrid] %s %s failed: %s", type(part).__name__, stop, e)
+
+
+async def crawl(start_url=START_URL, max_pages=MAX_PAGES, concurrency=CONCURRENCY, browser_tabs=BROWSER_TABS,
+                delay=0.5, rate=None, block_resources=True, order="bfs", parser="auto",
+                out_file="site_structure.json", resume=False, checkpoint_every=50, graph_out=None,
+                dedup=True, min_words=30, spa_words=200, metrics=None):
+    """
+    Crawl `start_url` with `concurrency` static fetch workers (robots.txt and
+    per-host politeness as in Crawl_site_BeautifulSoup: `rate` requests/second,
+    default one every `delay` seconds) and write the site map to `out_file`. Pages
+    that escalate (see the module docstring) are rendered in one of `browser_tabs`
+    tabs instead. A `.jsonl` `out_file` is streamed and checkpointed like the
+    Playwright crawler's; `graph_out` and `dedup` are as there too.
+    """
+    metrics = metrics or CrawlMetrics()
+    base_domain = urlparse(start_url).netloc
+    if rate is None and delay > 0:
+        rate = 1.0 / delay
+    scheduler = HostScheduler(rate=rate)
+    session = make_session(concurrency)
+    robots = RobotsCache(session=session)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    loop = asyncio.get_running_loop()
+    browser = Browser(browser_tabs, block_resources)
+    deduper = PageDeduplicator(start_url) if dedup else None
+    canonicalize = deduper.canonicalize if deduper else None
+    graph = SiteGraph() if graph_out else None
+
+    journal = CrawlJournal(out_file, resume=resume, every=checkpoint_every) if is_stream_path(out_file) else None
+    crawl = CrawlLoop(Frontier(order=order), max_pages, journal=journal, deduper=deduper, graph=graph,
+                      metrics=metrics)
+    crawl.start(canonicalize(start_url) if canonicalize else start_url)
+    escalated = 0
+
+    def fetch(url):
+        t0 = time.perf_counter()
+        resp = session.get(url, timeout=15)
+        ttfb = resp.elapsed.total_seconds()
+        metrics.observe("ttfb", ttfb)
+        metrics.observe("download", max(0.0, time.perf_counter() - t0 - ttfb))
+        metrics.response(resp.status_code, len(resp.content))
+        return resp
+
+    def parse_static(url, html):
+        page = extract_page(html, parser)
+        text = visible_text(html)
+        links = internal_links(url, page["links"], base_domain, canonicalize)
+        info = (page["title"] or "", links, extract_forms(html), page["canonical"], text, None)
+        return info, len(words_of(text))
+
+    async def visit(url, parent, depth):  # see crawl_loop.CrawlLoop.run
+        nonlocal escalated
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or parsed.netloc != base_domain:
+            log.debug("[skip] %s", url)
+            return
+        with metrics.timer("robots"):
+            allowed, crawl_delay = await loop.run_in_executor(executor, robots.check, url)
+        if not allowed:
+            log.info("[robots.txt] Skipping disallowed: %s", url)
+            metrics.incr("robots_disallowed")
+            return
+        scheduler.apply_crawl_delay(parsed.netloc, crawl_delay)
+        with metrics.timer("politeness_wait"):
+            await scheduler.wait(url)
+        try:
+            log.info("[crawl] GET %s", url)
+            resp = await loop.run_in_executor(executor, fetch, url)
+        except Exception as e:
+            log.error("[error] fetching %s => %s", url, e)
+            metrics.incr("fetch_errors")
+            return
+        if resp.status_code != 200:
+            log.warning("[status] %s for %s", resp.status_code, url)
+            return
+
+        with metrics.timer("parse"):
+            info, words = parse_static(url, resp.text)
+        reason = escalation_reason(resp.text, words, info[1], min_words, spa_words)
+        if reason and not browser.available:
+            metrics.incr("escalation_skipped")  # the browser failed to start earlier
+        elif reason:
+            log.info("[hybrid] %s: rendering %s in the browser", reason, url)
+            with metrics.timer("politeness_wait"):
+                await scheduler.wait(url)  # the browser's request counts like any other
+            try:
+                status, rendered = await browser.render(url, base_domain, metrics, canonicalize)
+            except Exception as e:
+                log.error("[error] rendering %s: %s; keeping the static page", url, e)
+                metrics.incr("render_errors")
+            else:
+                if status is None or 200 <= status < 300:
+                    info = rendered
+                    escalated += 1
+                    metrics.incr("escalated")
+                    metrics.incr("escalated_" + reason.replace(" ", "_"))
+                else:
+                    log.warning("[status] %s in the browser for %s; keeping the static page", status, url)
+                    metrics.incr("render_errors")
+        title, links, forms, declared, text, _ = info
+
+        key = crawl.admit(url, declared, text)
+        if key:
+            crawl.store(url, {"title": title, "url": key, "parent": parent, "links": links, "forms": forms}, key)
+
+    try:
+        await crawl.run(visit, concurrency)
+    finally:
+        crawl.close()
+        await browser.close()
+        executor.shutdown(wait=False)
+        session.close()
+        metrics.finish()
+
+    if not journal:
+        with open(out_file, "w", encoding="utf-8") as f:
+            json.dump(crawl.site_map, f, indent=2)
+
+    log.info("[ok] Crawled %s pages → %s", crawl.pages, out_file)
+    reasons = {k[len("escalated_"):]: n for k, n in metrics.counters.items() if k.startswith("escalated_")}
+    log.info("[hybrid] %s of %s pages rendered in the browser %s; %s render attempts failed, "
+             "%s pages left static after the browser failed to start", escalated, crawl.visited, reasons,
+             metrics.counters.get("render_errors", 0), metrics.counters.get("escalation_skipped", 0))
+    if deduper:
+        log.info("[dedup] %s", deduper.stats())
+    if graph is not None:
+        graph.save(graph_out)
+        log.info("[ok] Site graph (%s pages, %s urls) → %s", len(graph), len(graph.urls), graph_out)
+    metrics.log_summary(log)
+    return escalated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static-first crawl that renders only JS-dependent pages")
+    parser.add_argument("start_url", nargs="?", default=START_URL, help=f"Start URL (default: {START_URL})")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES, help="Maximum pages to crawl")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Number of parallel fetch workers")
+    parser.add_argument("--browser-tabs", type=int, default=BROWSER_TABS, help="Browser tabs for escalated pages")
+    parser.add_argument("--delay", type=float, default=0.6, help="Delay (seconds) between requests")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Max requests/second per host (default: 1 / --delay)")
+    parser.add_argument("--parser", choices=["auto", *BACKENDS], default="auto",
+                        help="HTML parser backend (auto = fastest installed)")
+    parser.add_argument("--min-words", type=int, default=30,
+                        help="Escalate pages with fewer words of static text than this")
+    parser.add_argument("--spa-words", type=int, default=200,
+                        help="Escalate pages with SPA markup and fewer words than this")
+    parser.add_argument("--no-block-resources", action="store_true",
+                        help="Load images, fonts and media too (blocked by default)")
+    parser.add_argument("--output", default="site_structure.json",
+                        help="Crawled JSON output file; a .jsonl path streams pages and checkpoints the frontier")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted .jsonl crawl")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="Pages between checkpoints")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Keep URL aliases (index.php, print views, tracking params) and near-duplicate pages")
+    parser.add_argument("--graph-out", default=None,
+                        help="Also save the crawl as a site graph (convert with mindmap_export.py)")
+    parser.add_argument("--puml", default="mindmap.puml", help="PlantUML output file")
+    parser.add_argument("--root-name", default="Website", help="Root node of the mind map")
+    parser.add_argument("--max-depth", type=int, default=None,
+                        help="Page levels shown in the mind map; deeper pages are summarized")
+    parser.add_argument("--forms", choices=FORM_MODES, default="full",
+                        help="Show forms in full, as one summary line each, or not at all")
+    parser.add_argument("--no-shared", action="store_true",
+                        help="Repeat shared forms on every page instead of a 'Shared components' branch")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO", help="Logging verbosity")
+    parser.add_argument("--report", nargs="?", const="crawl_report.json", default=None, metavar="PATH",
+                        help="Write a JSON run report: stage timings, escalations, status codes, bytes, pages/s"
+                             " (default path: crawl_report.json)")
+    parser.add_argument("--prometheus", default=None, help="Also write the metrics in Prometheus text format")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+    metrics = CrawlMetrics()
+
+    asyncio.run(crawl(args.start_url, max_pages=args.max_pages, concurrency=args.concurrency,
+                      browser_tabs=args.browser_tabs, delay=args.delay, rate=args.rate,
+                      block_resources=not args.no_block_resources, parser=args.parser, out_file=args.output,
+                      resume=args.resume, checkpoint_every=args.checkpoint_every, graph_out=args.graph_out,
+                      dedup=not args.no_dedup, min_words=args.min_words, spa_words=args.spa_words,
+                      metrics=metrics))
+    json_to_plantuml(args.output, args.puml, root_name=args.root_name,
+                     max_depth=args.max_depth, forms=args.forms, dedup=not args.no_dedup,
+                     shared=not args.no_shared, metrics=metrics)
+    metrics.write(args.report, args.prometheus)
+
+
+if __name__ == "__main__":
+    main()
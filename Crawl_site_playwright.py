@@ -1,11 +1,23 @@
-import asyncio, json
+import argparse, asyncio, functools, json, logging, time
 from urllib.parse import urlparse, urljoin
 from playwright.async_api import async_playwright
 
+from frontier import Frontier
+from crawl_loop import CrawlLoop
+from crawl_output import CrawlJournal, is_stream_path, open_site_map
+from mindmap_export import FORM_MODES, graph_to_plantuml
+from site_graph import SiteGraph
+from dedup import PageDeduplicator, collapse_site_map
+from crawl_metrics import LOG_LEVELS, CrawlMetrics, configure_logging
+
+log = logging.getLogger(__name__)
+
 START_URL = "https://www.340bpriceguide.net/"
-MAX_PAGES = 50  # adjust as needed
+MAX_PAGES = 50  # adjust as needed (--max-pages)
+CONCURRENCY = 1  # parallel tabs (--concurrency); more tabs mean more load on the site
 
-BASE_DOMAIN = urlparse(START_URL).netloc
+# resource types aborted by request routing; the crawler only needs the DOM
+BLOCKED_RESOURCES = {"image", "font", "media"}
 
 
 def normalize_url(base, link):
@@ -13,149 +25,336 @@ def normalize_url(base, link):
     return urljoin(base, link.split("#")[0].rstrip("/"))
 
 
-async def crawl():
-    site_map, visited, to_visit = {}, set(), [(None, START_URL)]  # (parent, url)
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-
-        while to_visit and len(visited) < MAX_PAGES:
-            parent, url = to_visit.pop()
-            if url in visited:
-                continue
-            visited.add(url)
-
-            parsed = urlparse(url)
-            # skip non-http(s) links
-            if parsed.scheme not in ["http", "https"]:
-                print(f"[skip] {url} (not http/https)")
-                continue
-
-            # restrict to teamupventures.com only
-            if parsed.netloc != BASE_DOMAIN:
-                print(f"[skip] {url} (external domain)")
+async def _block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class TabPool:
+    """
+    `size` browser contexts with one long-lived tab each. Tabs are handed out with
+    `acquire()` / `release()` and reused for every navigation, so context setup
+    and routing are paid once per tab instead of once per page.
+    """
+
+    def __init__(self, browser, size: int = CONCURRENCY, block_resources: bool = True):
+        self.browser = browser
+        self.size = max(1, size)
+        self.block_resources = block_resources
+        self._contexts = []
+        self._idle = asyncio.Queue()
+
+    async def start(self):
+        for _ in range(self.size):
+            context = await self.browser.new_context()
+            if self.block_resources:
+                await context.route("**/*", _block_heavy_resources)
+            self._contexts.append(context)
+            self._idle.put_nowait(await context.new_page())
+        return self
+
+    async def acquire(self):
+        return await self._idle.get()
+
+    def release(self, page):
+        self._idle.put_nowait(page)
+
+    async def close(self):
+        for context in self._contexts:
+            await context.close()
+
+
+# Navigation Timing of the loaded document in milliseconds (for crawl_metrics), or null.
+NAVIGATION_TIMING_JS = """
+() => {
+  const nav = performance.getEntriesByType("navigation")[0];
+  if (!nav) return null;
+  return {dns: nav.domainLookupEnd - nav.domainLookupStart, connect: nav.connectEnd - nav.connectStart,
+          ttfb: nav.responseStart - nav.requestStart, download: nav.responseEnd - nav.responseStart,
+          bytes: nav.encodedBodySize};
+}
+"""
+
+# One round-trip: title, raw hrefs, forms (hidden fields excluded), the rel=canonical
+# href, the visible text (for near-duplicate detection) and the navigation timing as
+# one JSON payload.
+EXTRACT_JS = """
+() => {
+  const navigationTiming = """ + NAVIGATION_TIMING_JS + """;
+  const links = Array.from(document.querySelectorAll("a[href]"), a => a.getAttribute("href"));
+  const forms = Array.from(document.querySelectorAll("form"), f => {
+    const inputs = [];
+    for (const el of f.querySelectorAll("input, textarea, select")) {
+      const type = el.getAttribute("type") || "text";
+      if (type.toLowerCase() === "hidden") continue;
+      inputs.push({name: el.getAttribute("name"), type: type, placeholder: el.getAttribute("placeholder")});
+    }
+    const buttons = [];
+    for (const b of f.querySelectorAll("button, input[type=submit]")) {
+      const text = (b.innerText || "").trim();
+      const value = b.getAttribute("value");
+      if (text || value) buttons.push(text || value);
+    }
+    return {action: f.getAttribute("action"), method: f.getAttribute("method") || "GET",
+            inputs: inputs, buttons: buttons};
+  });
+  const canonical = document.querySelector("link[rel~=canonical i]");
+  return {title: document.title, links: links, forms: forms,
+          canonical: canonical ? canonical.getAttribute("href") : null,
+          text: document.body ? document.body.innerText : "", timing: navigationTiming()};
+}
+"""
+
+
+def internal_links(url, anchors, base_domain, canonicalize=None):
+    """Normalized (or canonicalized, see dedup.py), de-duplicated, sorted same-domain http(s) links."""
+    links = set()
+    for l in anchors:
+        if not l:
+            continue
+        full = canonicalize(l, base=url) if canonicalize else normalize_url(url, l)
+        parsed = urlparse(full)
+        if parsed.scheme in ["http", "https"] and parsed.netloc == base_domain:
+            links.add(full)
+    return sorted(links)
+
+
+async def extract_page_info(page, url, base_domain, canonicalize=None):
+    """
+    Title, internal links, visible form fields, rel=canonical href, body text and
+    navigation timing (or None) of the page loaded in `page`.
+    """
+    data = await page.evaluate(EXTRACT_JS)
+    links = internal_links(url, data["links"], base_domain, canonicalize)
+    return data["title"], links, data["forms"], data["canonical"], data["text"], data.get("timing")
+
+
+async def extract_page_info_per_element(page, url, base_domain, canonicalize=None):
+    """
+    The old extraction: one CDP round-trip per attribute of every form element.
+    Kept only to measure against `extract_page_info` (--extract per-element).
+    """
+    title = await page.title()
+
+    # collect links (internal only)
+    anchors = await page.eval_on_selector_all(
+        "a[href]", "els => els.map(e => e.getAttribute('href'))"
+    )
+    links = internal_links(url, anchors, base_domain, canonicalize)
+
+    # collect forms (exclude hidden fields)
+    forms = []
+    form_elements = await page.query_selector_all("form")
+    for f in form_elements:
+        form_info = {
+            "action": await f.get_attribute("action"),
+            "method": (await f.get_attribute("method")) or "GET",
+            "inputs": [],
+            "buttons": [],
+        }
+        inputs = await f.query_selector_all("input, textarea, select")
+        for inp in inputs:
+            itype = (await inp.get_attribute("type")) or "text"
+            if itype.lower() == "hidden":
                 continue
-
-            try:
-                await page.goto(url, timeout=30000)
-                title = await page.title()
-
-                # collect links (internal only)
-                anchors = await page.eval_on_selector_all(
-                    "a[href]", "els => els.map(e => e.getAttribute('href'))"
-                )
-                links = sorted(
-                    set(
-                        normalize_url(url, l)
-                        for l in anchors
-                        if l
-                        and urlparse(normalize_url(url, l)).scheme in ["http", "https"]
-                        and urlparse(normalize_url(url, l)).netloc == BASE_DOMAIN
-                    )
-                )
-
-                # collect forms (exclude hidden fields)
-                forms = []
-                form_elements = await page.query_selector_all("form")
-                for f in form_elements:
-                    form_info = {
-                        "action": await f.get_attribute("action"),
-                        "method": (await f.get_attribute("method")) or "GET",
-                        "inputs": [],
-                        "buttons": [],
-                    }
-                    inputs = await f.query_selector_all("input, textarea, select")
-                    for inp in inputs:
-                        itype = (await inp.get_attribute("type")) or "text"
-                        if itype.lower() == "hidden":
-                            continue
-                        name = await inp.get_attribute("name")
-                        placeholder = await inp.get_attribute("placeholder")
-                        form_info["inputs"].append(
-                            {"name": name, "type": itype, "placeholder": placeholder}
-                        )
-                    btns = await f.query_selector_all("button, input[type=submit]")
-                    for b in btns:
-                        text = (await b.inner_text()).strip()
-                        value = await b.get_attribute("value")
-                        if text or value:
-                            form_info["buttons"].append(text or value)
-                    forms.append(form_info)
-
-                # store page info
-                site_map[url] = {
-                    "title": title,
-                    "url": url,
-                    "parent": parent,
-                    "links": links,
-                    "forms": forms,
-                }
-
-                # queue children (only internal)
-                for l in links:
-                    if l not in visited and l not in [x[1] for x in to_visit]:
-                        to_visit.append((url, l))
-
-            except Exception as e:
-                print(f"[error] {url}: {e}")
-
-        await browser.close()
-
-    with open("site_structure.json", "w", encoding="utf-8") as f:
-        json.dump(site_map, f, indent=2)
-
-    print(f"[ok] Crawled {len(site_map)} pages → site_structure.json")
-
-
-# --- Convert JSON to PlantUML mind map ---
-def site_map_to_plantuml(site_map, root_name="Website"):
-    lines = ["@startmindmap", f"* {root_name}"]
-
-    def add_nodes(url, depth=2, visited=set()):
-        if url in visited:
+            name = await inp.get_attribute("name")
+            placeholder = await inp.get_attribute("placeholder")
+            form_info["inputs"].append(
+                {"name": name, "type": itype, "placeholder": placeholder}
+            )
+        btns = await f.query_selector_all("button, input[type=submit]")
+        for b in btns:
+            text = (await b.inner_text()).strip()
+            value = await b.get_attribute("value")
+            if text or value:
+                form_info["buttons"].append(text or value)
+        forms.append(form_info)
+
+    canonical = await page.evaluate(
+        "() => { const l = document.querySelector('link[rel~=canonical i]'); return l && l.getAttribute('href'); }"
+    )
+    text = await page.inner_text("body")
+    timing = await page.evaluate(NAVIGATION_TIMING_JS)
+    return title, links, forms, canonical, text, timing
+
+
+EXTRACTORS = {"batch": extract_page_info, "per-element": extract_page_info_per_element}
+
+
+async def crawl(start_url=START_URL, max_pages=MAX_PAGES, concurrency=CONCURRENCY,
+                block_resources=True, order="dfs", out_file="site_structure.json",
+                extract="batch", resume=False, checkpoint_every=50, graph_out=None, dedup=True,
+                metrics=None):
+    """
+    Crawl `start_url` with `concurrency` tabs pulling from one shared frontier and
+    write the site map to `out_file`. Per-page extraction time is reported at the end.
+
+    A `.jsonl` `out_file` is streamed instead: each page is appended as soon as it is
+    extracted (nothing is kept in memory) and the frontier is checkpointed every
+    `checkpoint_every` pages, so `resume=True` can continue an interrupted crawl.
+
+    With `graph_out`, every page is also added to a SiteGraph (site_graph.py) as it is
+    crawled and the graph is saved there at the end.
+
+    `dedup` and `metrics` are as in dedup.py and crawl_metrics.py.
+    """
+    metrics = metrics or CrawlMetrics()
+    extractor = EXTRACTORS[extract]
+    extract_times = []
+    base_domain = urlparse(start_url).netloc
+    graph = SiteGraph() if graph_out else None
+    deduper = PageDeduplicator(start_url) if dedup else None
+    canonicalize = deduper.canonicalize if deduper else None
+    journal = CrawlJournal(out_file, resume=resume, every=checkpoint_every) if is_stream_path(out_file) else None
+    crawl = CrawlLoop(Frontier(order=order), max_pages, journal=journal, deduper=deduper, graph=graph,
+                      metrics=metrics)
+    crawl.start(canonicalize(start_url) if canonicalize else start_url)
+
+    async def visit(pool, url, parent, depth):  # see crawl_loop.CrawlLoop.run
+        parsed = urlparse(url)
+        # skip non-http(s) links
+        if parsed.scheme not in ["http", "https"]:
+            log.debug("[skip] %s (not http/https)", url)
             return
-        visited.add(url)
 
-        node = site_map[url]
-        prefix = "*" * depth
-        title = node.get("title") or url
-        lines.append(f"{prefix} {title} ({urlparse(url).path or '/'})")
-
-        # forms
-        for form in node.get("forms", []):
-            lines.append(f"{prefix}* Form: {form['method']} {form['action'] or ''}")
-            for inp in form["inputs"]:
-                inp_name = inp["name"] or inp.get("placeholder") or "unnamed"
-                lines.append(f"{prefix}** Field: {inp_name} ({inp['type']})")
-            for btn in form["buttons"]:
-                lines.append(f"{prefix}** Button: {btn}")
-
-        # children
-        for child_url in node["links"]:
-            if child_url in site_map and site_map[child_url]["parent"] == url:
-                add_nodes(child_url, depth + 1, visited)
+        # restrict to the start domain only
+        if parsed.netloc != base_domain:
+            log.debug("[skip] %s (external domain)", url)
+            return
 
-    for url, node in site_map.items():
-        if node["parent"] is None:
-            add_nodes(url, depth=2)
+        page = await pool.acquire()
+        try:
+            with metrics.timer("navigate"):
+                response = await page.goto(url, timeout=30000)
+            t0 = time.perf_counter()
+            title, links, forms, declared, text, timing = await extractor(page, url, base_domain, canonicalize)
+            extract_times.append(time.perf_counter() - t0)
+            metrics.observe("extract", extract_times[-1])
+            if timing:
+                for stage in ("dns", "connect", "ttfb", "download"):
+                    metrics.observe(stage, max(0.0, timing[stage]) / 1000)
+            metrics.response(response.status if response else None, (timing or {}).get("bytes", 0))
+        except Exception as e:
+            log.error("[error] %s: %s", url, e)
+            metrics.incr("fetch_errors")
+            return
+        finally:
+            pool.release(page)
 
-    lines.append("@endmindmap")
-    return "\n".join(lines)
+        key = crawl.admit(url, declared, text)
+        if key:
+            # store page info; its children (only internal) are queued by `store`
+            crawl.store(url, {"title": title, "url": key, "parent": parent, "links": links, "forms": forms}, key)
 
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        pool = await TabPool(browser, size=concurrency, block_resources=block_resources).start()
+        try:
+            await crawl.run(functools.partial(visit, pool), pool.size)
+        finally:
+            crawl.close()
+            await pool.close()
+            await browser.close()
+            metrics.finish()
+
+    if not journal:
+        with open(out_file, "w", encoding="utf-8") as f:
+            json.dump(crawl.site_map, f, indent=2)
+
+    log.info("[ok] Crawled %s pages → %s", crawl.pages, out_file)
+    if deduper:
+        log.info("[dedup] %s", deduper.stats())
+    if graph is not None:
+        graph.save(graph_out)
+        log.info("[ok] Site graph (%s pages, %s urls) → %s", len(graph), len(graph.urls), graph_out)
+    if extract_times:
+        extract_times.sort()
+        ms = [t * 1000 for t in extract_times]
+        log.info("[extract] %s: mean %.1f ms/page, median %.1f ms, max %.1f ms over %s pages",
+                 extract, sum(ms) / len(ms), ms[len(ms) // 2], ms[-1], len(ms))
+    metrics.log_summary(log)
 
-def json_to_plantuml(json_file, puml_file="mindmap.puml"):
-    with open(json_file, "r", encoding="utf-8") as f:
-        site_map = json.load(f)
 
-    plantuml_code = site_map_to_plantuml(site_map, root_name="Teamup Ventures")
+# --- Convert JSON to PlantUML mind map ---
+def site_map_to_plantuml(site_map, root_name="Website", max_depth=None, forms="full", shared=True):
+    """
+    Pages nested under their crawl parent, children in the parent's link order.
+    `max_depth` limits how many page levels are shown (deeper pages are summarized
+    as "… N more pages"); `forms` is "full", "summary" (one line per form) or "none".
+    With `shared`, forms found on several pages are listed once under "Shared
+    components" and pages get a "Uses: F1, F2" line instead.
+    """
+    return graph_to_plantuml(SiteGraph.from_site_map(site_map), root_name, max_depth, forms, shared)
+
+
+def json_to_plantuml(json_file, puml_file="mindmap.puml", root_name="Teamup Ventures",
+                     max_depth=None, forms="full", dedup=True, shared=True, metrics=None):
+    t0 = time.perf_counter()
+    # a .jsonl crawl stream is read lazily (see crawl_output.JsonlSiteMap)
+    with open_site_map(json_file) as site_map:
+        if dedup and not is_stream_path(json_file):
+            # URL aliases left in older crawls (index.php, print views, http/https);
+            # a stream was deduplicated while crawling and is not loaded whole here
+            site_map, merged = collapse_site_map(site_map)
+            if merged:
+                log.info("[dedup] merged %s alias pages into %s pages", len(merged), len(site_map))
+
+        plantuml_code = site_map_to_plantuml(site_map, root_name=root_name, max_depth=max_depth, forms=forms,
+                                             shared=shared)
 
     with open(puml_file, "w", encoding="utf-8") as f:
         f.write(plantuml_code)
-
-    print(f"[ok] PlantUML mind map saved to {puml_file}")
+    if metrics is not None:
+        metrics.observe("convert", time.perf_counter() - t0)
+
+    log.info("[ok] PlantUML mind map saved to %s", puml_file)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("start_url", nargs="?", default=START_URL, help=f"Start URL (default: {START_URL})")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES, help="Maximum pages to crawl")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Number of parallel browser tabs")
+    parser.add_argument("--no-block-resources", action="store_true",
+                        help="Load images, fonts and media too (blocked by default)")
+    parser.add_argument("--extract", choices=sorted(EXTRACTORS), default="batch",
+                        help="Form/link extraction strategy (per-element is the old, slow path)")
+    parser.add_argument("--output", default="site_structure.json",
+                        help="Crawled JSON output file; a .jsonl path streams pages and checkpoints the frontier")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted .jsonl crawl")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="Pages between checkpoints")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Keep URL aliases (index.php, print views, tracking params) and near-duplicate pages")
+    parser.add_argument("--graph-out", default=None,
+                        help="Also save the crawl as a site graph (convert with mindmap_export.py)")
+    parser.add_argument("--puml", default="mindmap.puml", help="PlantUML output file")
+    parser.add_argument("--root-name", default="Teamup Ventures", help="Root node of the mind map")
+    parser.add_argument("--max-depth", type=int, default=None,
+                        help="Page levels shown in the mind map; deeper pages are summarized")
+    parser.add_argument("--forms", choices=FORM_MODES, default="full",
+                        help="Show forms in full, as one summary line each, or not at all")
+    parser.add_argument("--no-shared", action="store_true",
+                        help="Repeat shared forms on every page instead of a 'Shared components' branch")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO", help="Logging verbosity")
+    parser.add_argument("--report", nargs="?", const="crawl_report.json", default=None, metavar="PATH",
+                        help="Write a JSON run report: stage timings, status codes, bytes, queue depth, pages/s"
+                             " (default path: crawl_report.json)")
+    parser.add_argument("--prometheus", default=None, help="Also write the metrics in Prometheus text format")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+    metrics = CrawlMetrics()
+
+    asyncio.run(crawl(args.start_url, max_pages=args.max_pages, concurrency=args.concurrency,
+                      block_resources=not args.no_block_resources, out_file=args.output,
+                      extract=args.extract, resume=args.resume, checkpoint_every=args.checkpoint_every,
+                      graph_out=args.graph_out, dedup=not args.no_dedup, metrics=metrics))
+    json_to_plantuml(args.output, args.puml, root_name=args.root_name,
+                     max_depth=args.max_depth, forms=args.forms, dedup=not args.no_dedup,
+                     shared=not args.no_shared, metrics=metrics)
+    metrics.write(args.report, args.prometheus)
 
 
 if __name__ == "__main__":
-    asyncio.run(crawl())
-    json_to_plantuml("site_structure.json")
+    main()
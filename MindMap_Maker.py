@@ -1,63 +1,23 @@
-import zlib
-import requests
+from plantuml_render import ServerRenderer, render_diagrams
 
-# ---------- PlantUML encoding ----------
-def encode6bit(b: int) -> str:
-    if b < 10:
-        return chr(48 + b)
-    b -= 10
-    if b < 26:
-        return chr(65 + b)
-    b -= 26
-    if b < 26:
-        return chr(97 + b)
-    b -= 26
-    if b == 0:
-        return "-"
-    if b == 1:
-        return "_"
-    return "?"
-
-def append3bytes(b1: int, b2: int, b3: int) -> str:
-    c1 = b1 >> 2
-    c2 = ((b1 & 0x3) << 4) | (b2 >> 4)
-    c3 = ((b2 & 0xF) << 2) | (b3 >> 6)
-    c4 = b3 & 0x3F
-    return (
-        encode6bit(c1 & 0x3F)
-        + encode6bit(c2 & 0x3F)
-        + encode6bit(c3 & 0x3F)
-        + encode6bit(c4 & 0x3F)
-    )
-
-def encode64(data: bytes) -> str:
-    res = ""
-    i = 0
-    length = len(data)
-    while i < length:
-        if i + 2 == length:
-            res += append3bytes(data[i], data[i + 1], 0)
-        elif i + 1 == length:
-            res += append3bytes(data[i], 0, 0)
-        else:
-            res += append3bytes(data[i], data[i + 1], data[i + 2])
-        i += 3
-    return res
-
-def plantuml_encode(text: str) -> str:
-    compressed = zlib.compress(text.encode("utf-8"))[2:-4]  # strip zlib headers
-    return encode64(compressed)
-
-def generate_mindmap(uml_code: str, output_file: str = "mindmap.svg"):
-    encoded = plantuml_encode(uml_code)
-    url = f"http://www.plantuml.com/plantuml/svg/{encoded}"  # <-- SVG instead of PNG
-    resp = requests.get(url)
-    if resp.status_code == 200:
-        with open(output_file, "wb") as f:
-            f.write(resp.content)
-        print(f"[ok] Mind map saved to {output_file}")
-    else:
-        print(f"[error] PlantUML server {resp.status_code}: {resp.text[:200]}")
+def generate_mindmap(uml_code: str, output_file: str = "mindmap.svg", renderer=None, cache=None):
+    """
+    Render `uml_code` to SVG (public PlantUML server unless another renderer is given;
+    see plantuml_render.py). With a RenderCache an unchanged diagram is not re-rendered.
+    """
+    own_renderer = renderer is None
+    renderer = renderer or ServerRenderer()
+    try:
+        result = render_diagrams([uml_code], renderer, cache=cache, max_workers=1)[0]
+    finally:
+        if own_renderer:
+            renderer.close()
+    if isinstance(result, Exception):
+        print(f"[error] {result}")
+        return
+    with open(output_file, "wb") as f:
+        f.write(result)
+    print(f"[ok] Mind map saved to {output_file}")
 
 # ---------- Example PlantUML with screenshot link ----------
 uml_code = """@startmindmap
@@ -115,5 +75,6 @@ uml_code = """@startmindmap
 
 """
 
-# Generate mind map as SVG
-generate_mindmap(uml_code, "teamup_mindmap.svg")
+if __name__ == "__main__":
+    # Generate mind map as SVG
+    generate_mindmap(uml_code, "teamup_mindmap.svg")
@@ -0,0 +1,35 @@
+"""
+Crawl throughput vs. `--concurrency` against the local fixture site.
+
+    python -m benchmarks.bench_crawl_concurrency --pages 200 --latency 0.05
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+from Crawl_site_BeautifulSoup import crawl_site
+from benchmarks.fixture_site import FixtureSite
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="Server-side latency per request (s)")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="Comma-separated concurrency levels")
+    args = parser.parse_args()
+
+    with FixtureSite(pages=args.pages, fanout=args.fanout, latency=args.latency) as site:
+        print(f"{'concurrency':>11} {'pages':>6} {'seconds':>8} {'pages/s':>8}")
+        for level in (int(x) for x in args.levels.split(",")):
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                site_map = crawl_site(site.url, max_pages=args.pages, delay=0, concurrency=level)
+            elapsed = time.perf_counter() - t0
+            print(f"{level:>11} {len(site_map):>6} {elapsed:>8.2f} {len(site_map) / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Per-page parse time: the old two-pass BeautifulSoup extraction vs. each page_extract
+backend.
+
+Pages come from `--html-dir` (saved *.html files) or, by default, are rendered from
+the checked-in site_structure.json.
+
+    python -m benchmarks.bench_extract
+    python -m benchmarks.bench_extract --html-dir saved_pages/
+"""
+
+import argparse
+import json
+import pathlib
+import time
+
+from bs4 import BeautifulSoup
+
+from benchmarks.fixture_site import render_site_map_page
+from page_extract import available_backends, extract_page
+
+
+def legacy_extract(html: str):
+    """The pre-page_extract code path: two html.parser soups, six find_all calls."""
+    soup = BeautifulSoup(html, "html.parser")
+    title_tag = soup.find("title")
+    title = title_tag.get_text(strip=True) if title_tag else None
+    headings_soup = BeautifulSoup(html, "html.parser")
+    headings = []
+    for level in range(1, 7):
+        for tag in headings_soup.find_all(f"h{level}"):
+            text = tag.get_text(separator=" ", strip=True)
+            if text:
+                headings.append((level, text))
+    links = [a.get("href") for a in soup.find_all("a", href=True)]
+    return {"title": title, "headings": headings, "links": links}
+
+
+def load_pages(html_dir: str, site_json: str):
+    if html_dir:
+        return [p.read_text(encoding="utf-8", errors="replace") for p in sorted(pathlib.Path(html_dir).glob("*.html"))]
+    with open(site_json, "r", encoding="utf-8") as f:
+        site_map = json.load(f)
+    return [render_site_map_page(url, meta) for url, meta in site_map.items()]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--html-dir", default=None, help="Directory of saved *.html pages")
+    parser.add_argument("--site-json", default="site_structure.json")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_pages(args.html_dir, args.site_json)
+    total_kb = sum(len(p) for p in pages) / 1024
+    print(f"{len(pages)} pages, {total_kb:.0f} KiB of HTML")
+
+    impls = [("legacy-bs4x2", legacy_extract)]
+    impls += [(name, lambda html, name=name: extract_page(html, name)) for name in available_backends()]
+
+    reference = [extract_page(p, "html.parser") for p in pages]
+    print(f"{'backend':>12} {'ms/page':>8} {'speedup':>8}")
+    baseline = None
+    for name, fn in impls:
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            results = [fn(p) for p in pages]
+            best = min(best, time.perf_counter() - t0)
+        for got, ref in zip(results, reference):
+            assert sorted(got["headings"]) == sorted(ref["headings"]), name
+            assert got["links"] == ref["links"], name
+        per_page = best / len(pages) * 1000
+        baseline = baseline or per_page
+        print(f"{name:>12} {per_page:>8.3f} {baseline / per_page:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Frontier micro-benchmark: the old list-based discovery loop vs. `frontier.Frontier`.
+
+Each popped URL "discovers" `fanout` links (some of them already seen), mimicking
+a crawl of a site with N pages. The list version is quadratic, so it is only run
+up to `--list-max`.
+
+    python -m benchmarks.bench_frontier --sizes 1000,10000,100000
+"""
+
+import argparse
+import time
+
+from frontier import Frontier
+
+
+def synthetic_links(n: int, fanout: int, total: int):
+    # children of n in a complete tree, plus a few back-links to already known pages
+    links = [f"https://example.com/p/{c}" for c in range(n * fanout + 1, n * fanout + fanout + 1) if c < total]
+    links += [f"https://example.com/p/{n // 2}", "https://example.com/p/0"]
+    return links
+
+
+def run_list(total: int, fanout: int) -> int:
+    visited, to_visit = set(), ["https://example.com/p/0"]
+    while to_visit:
+        url = to_visit.pop(0)
+        if url in visited:
+            continue
+        visited.add(url)
+        n = int(url.rsplit("/", 1)[1])
+        for l in synthetic_links(n, fanout, total):
+            if l not in visited and l not in to_visit:
+                to_visit.append(l)
+    return len(visited)
+
+
+def run_frontier(total: int, fanout: int, order: str) -> int:
+    frontier = Frontier(order=order)
+    frontier.push("https://example.com/p/0")
+    popped = 0
+    while frontier:
+        url, _, depth = frontier.pop()
+        popped += 1
+        n = int(url.rsplit("/", 1)[1])
+        frontier.extend(synthetic_links(n, fanout, total), parent=url, depth=depth + 1)
+    return popped
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    count = fn(*args)
+    return count, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,5000,10000,50000,100000")
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--list-max", type=int, default=10000, help="Largest size to run the list version for")
+    args = parser.parse_args()
+
+    print(f"{'urls':>8} {'impl':>13} {'seconds':>9} {'us/url':>8}")
+    for total in (int(x) for x in args.sizes.split(",")):
+        runs = [("frontier-bfs", run_frontier, (total, args.fanout, "bfs")),
+                ("frontier-best", run_frontier, (total, args.fanout, "best-first"))]
+        if total <= args.list_max:
+            runs.insert(0, ("list", run_list, (total, args.fanout)))
+        for name, fn, fn_args in runs:
+            count, elapsed = timed(fn, *fn_args)
+            assert count == total, (name, count, total)
+            print(f"{total:>8} {name:>13} {elapsed:>9.3f} {elapsed / total * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
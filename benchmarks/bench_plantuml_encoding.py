@@ -0,0 +1,108 @@
+"""
+PlantUML encoder throughput: the old per-sextet string-building encoder vs. the
+table-driven one in plantuml_encoding.py. Also checks that both agree and that
+decoding round-trips.
+
+    python -m benchmarks.bench_plantuml_encoding --mb 1,4
+"""
+
+import argparse
+import random
+import time
+import zlib
+
+from plantuml_encoding import encode64, plantuml_decode, plantuml_encode
+
+
+# ---------- legacy encoder (as previously copy-pasted in both scripts) ----------
+def legacy_encode6bit(b: int) -> str:
+    if b < 10:
+        return chr(48 + b)
+    b -= 10
+    if b < 26:
+        return chr(65 + b)
+    b -= 26
+    if b < 26:
+        return chr(97 + b)
+    b -= 26
+    if b == 0:
+        return "-"
+    if b == 1:
+        return "_"
+    return "?"
+
+
+def legacy_append3bytes(b1: int, b2: int, b3: int) -> str:
+    c1 = b1 >> 2
+    c2 = ((b1 & 0x3) << 4) | (b2 >> 4)
+    c3 = ((b2 & 0xF) << 2) | (b3 >> 6)
+    c4 = b3 & 0x3F
+    r = ""
+    r += legacy_encode6bit(c1 & 0x3F)
+    r += legacy_encode6bit(c2 & 0x3F)
+    r += legacy_encode6bit(c3 & 0x3F)
+    r += legacy_encode6bit(c4 & 0x3F)
+    return r
+
+
+def legacy_encode64(data: bytes) -> str:
+    res = ""
+    i = 0
+    length = len(data)
+    while i < length:
+        if i + 2 == length:
+            res += legacy_append3bytes(data[i], data[i + 1], 0)
+        elif i + 1 == length:
+            res += legacy_append3bytes(data[i], 0, 0)
+        else:
+            res += legacy_append3bytes(data[i], data[i + 1], data[i + 2])
+        i += 3
+    return res
+
+
+def synthetic_mindmap(target_bytes: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines, size, n = ["@startmindmap", "* Site"], 0, 0
+    while size < target_bytes:
+        n += 1
+        line = "*" * rng.randint(2, 6) + f" Page {n} ({rng.getrandbits(64):x}) /section/{rng.randint(0, 999)}"
+        lines.append(line)
+        size += len(line) + 1
+    lines.append("@endmindmap")
+    return "\n".join(lines)
+
+
+def timed(fn, arg):
+    t0 = time.perf_counter()
+    out = fn(arg)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", default="1,4", help="Comma-separated diagram sizes in MiB")
+    parser.add_argument("--puml", default="mindmap.puml", help="Checked-in diagram used for the agreement check")
+    args = parser.parse_args()
+
+    with open(args.puml, "r", encoding="utf-8") as f:
+        text = f.read()
+    compressed = zlib.compress(text.encode("utf-8"))[2:-4]
+    assert legacy_encode64(compressed) == encode64(compressed)
+    for k in range(3):  # every padding case
+        assert legacy_encode64(compressed[:len(compressed) - k]) == encode64(compressed[:len(compressed) - k])
+    assert plantuml_decode(plantuml_encode(text)) == text
+    print(f"{args.puml}: encoders agree, round-trip ok")
+
+    print(f"{'diagram':>8} {'deflated':>9} {'impl':>7} {'encode64 s':>11} {'MiB/s':>8}")
+    for mb in (float(x) for x in args.mb.split(",")):
+        diagram = synthetic_mindmap(int(mb * 1024 * 1024))
+        data = zlib.compress(diagram.encode("utf-8"))[2:-4]
+        assert plantuml_decode(plantuml_encode(diagram)) == diagram
+        for name, fn in (("legacy", legacy_encode64), ("table", encode64)):
+            _, elapsed = timed(fn, data)
+            print(f"{mb:>6.1f}MB {len(data) / 1024:>7.0f}KB {name:>7} {elapsed:>11.4f} "
+                  f"{len(data) / 1024 / 1024 / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
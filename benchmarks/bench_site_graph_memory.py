@@ -0,0 +1,80 @@
+"""
+Memory per page: crawler site-map dicts vs. SiteGraph (site_graph.py).
+
+Synthetic pages look like a merged record of both crawlers: a title, a few
+headings, `--links` internal links (nav links shared by every page plus links to
+children and random pages) and the same search form on every page. Each record is
+built from fresh strings, the way json.load or a crawler produces them, and the
+graph is filled one record at a time, the way the crawlers fill it.
+
+    python -m benchmarks.bench_site_graph_memory --pages 10000,100000
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from site_graph import SiteGraph
+
+NAV = ["/", "/about-us", "/contact-us", "/articles-news", "/340b-search", "/client-login"]
+
+
+def synthetic_records(pages: int, links: int = 20, fanout: int = 5, seed: int = 0):
+    rng = random.Random(seed)
+    base = "https://www.example-health-site.test"
+    url = lambda i: f"{base}/articles-news/{i}-weekly-product-update" if i else f"{base}/"
+    for i in range(pages):
+        kids = [url(c) for c in range(i * fanout + 1, i * fanout + fanout + 1) if c < pages]
+        extra = [url(rng.randrange(pages)) for _ in range(max(0, links - len(NAV) - len(kids)))]
+        yield url(i), {
+            "title": f"Weekly product update {i} - 340B Price Guide",
+            "url": url(i),
+            "parent": url((i - 1) // fanout) if i else None,
+            "headings": [(1, f"Weekly product update {i}"), (2, "Shortages"), (2, "Recalls")],
+            "links": [f"{base}{p}" for p in NAV] + kids + extra,
+            "forms": [{"action": "/", "method": "post",
+                       "inputs": [{"name": "searchword", "type": "text", "placeholder": "Search..."}],
+                       "buttons": ["Go"]}],
+        }
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", default="10000,100000", help="Comma-separated graph sizes")
+    parser.add_argument("--links", type=int, default=20, help="Links per page")
+    args = parser.parse_args()
+
+    print(f"{'pages':>8} {'model':>9} {'MiB':>8} {'bytes/page':>11} {'peak MiB':>9} {'build s':>8}")
+    for pages in (int(x) for x in args.pages.split(",")):
+        def build_dict():
+            return dict(synthetic_records(pages, args.links))
+
+        def build_graph():
+            graph = SiteGraph()
+            for url, record in synthetic_records(pages, args.links):
+                graph.add_record(url, record)
+            return graph
+
+        for name, build in (("dict", build_dict), ("SiteGraph", build_graph)):
+            obj, current, peak, elapsed = measure(build)
+            print(f"{pages:>8} {name:>9} {current / 2**20:>8.1f} {current / pages:>11.0f} "
+                  f"{peak / 2**20:>9.1f} {elapsed:>8.2f}")
+            del obj
+
+
+if __name__ == "__main__":
+    main()
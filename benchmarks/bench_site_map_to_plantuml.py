@@ -0,0 +1,122 @@
+"""
+site_map_to_plantuml scaling: the old recursive builder (one Python frame per
+tree level) vs. the current one, which builds a SiteGraph and walks it with an
+explicit stack (site_graph.py, mindmap_export.py).
+
+Synthetic site maps use the Playwright crawler's schema. "wide" is a shallow tree
+with `--fanout` children per page; "chain" is one parent chain of `--chain-depth`
+pages, which the recursive builder cannot render past the recursion limit. (A
+mind map's line prefix grows with depth, so chain output is quadratic by nature.)
+
+    python -m benchmarks.bench_site_map_to_plantuml --pages 1000,10000,100000
+"""
+
+import argparse
+import json
+import time
+from urllib.parse import urlparse
+
+from Crawl_site_playwright import site_map_to_plantuml
+
+
+# ---------- legacy builder (as previously in Crawl_site_playwright.py) ----------
+def legacy_site_map_to_plantuml(site_map, root_name="Website"):
+    lines = ["@startmindmap", f"* {root_name}"]
+    def add_nodes(url, depth=2, visited=set()):
+        if url in visited: return
+        visited.add(url)
+        node = site_map[url]
+        prefix = "*" * depth
+        title = node.get("title") or url
+        lines.append(f"{prefix} {title} ({urlparse(url).path or '/'})")
+        for form in node.get("forms", []):
+            lines.append(f"{prefix}* Form: {form['method']} {form['action'] or ''}")
+            for inp in form["inputs"]:
+                inp_name = inp["name"] or inp.get("placeholder") or "unnamed"
+                lines.append(f"{prefix}** Field: {inp_name} ({inp['type']})")
+            for btn in form["buttons"]:
+                lines.append(f"{prefix}** Button: {btn}")
+        for child_url in node["links"]:
+            if child_url in site_map and site_map[child_url]["parent"] == url:
+                add_nodes(child_url, depth + 1, visited)
+    for url, node in site_map.items():
+        if node["parent"] is None:
+            add_nodes(url, depth=2)
+    lines.append("@endmindmap")
+    return "\n".join(lines)
+
+
+SEARCH_FORM = {"action": "/search", "method": "get",
+               "inputs": [{"name": "q", "type": "text", "placeholder": "Search"}], "buttons": ["Go"]}
+
+
+def synthetic_site_map(pages: int, fanout: int = 5, chain: bool = False) -> dict:
+    """Page i's parent is (i - 1) // fanout, or i - 1 for a chain. Every page links home."""
+    url = lambda i: f"https://example.test/p/{i}" if i else "https://example.test/"
+    site_map = {}
+    for i in range(pages):
+        if chain:
+            kids = [i + 1] if i + 1 < pages else []
+            parent = url(i - 1) if i else None
+        else:
+            kids = [c for c in range(i * fanout + 1, i * fanout + fanout + 1) if c < pages]
+            parent = url((i - 1) // fanout) if i else None
+        site_map[url(i)] = {"title": f"Page {i}", "parent": parent,
+                            "links": [url(0)] + [url(c) for c in kids], "forms": [SEARCH_FORM]}
+    return site_map
+
+
+def page_lines(lines):
+    """The page nodes of a mind map: what is left once forms and shared components are dropped."""
+    pages, skip = [], None
+    for line in lines:
+        stars, _, text = line.partition(" ")
+        if skip is not None and len(stars) > skip:
+            continue
+        skip = None
+        if text == "Shared components":
+            skip = len(stars)
+        elif stars.startswith("*") and not text.startswith(("Form: ", "Field: ", "Button: ", "Uses: ")):
+            pages.append(line)
+    return pages
+
+
+def timed(fn, site_map):
+    t0 = time.perf_counter()
+    try:
+        out = fn(site_map)
+    except RecursionError:
+        return None, time.perf_counter() - t0
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", default="1000,10000,100000", help="Comma-separated site sizes")
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--chain-depth", type=int, default=5000)
+    parser.add_argument("--json", default="site_structure.json", help="Real crawl used for the agreement check")
+    args = parser.parse_args()
+
+    with open(args.json, "r", encoding="utf-8") as f:
+        real = json.load(f)
+    legacy = legacy_site_map_to_plantuml(real, "Site")
+    assert legacy == site_map_to_plantuml(real, "Site", shared=False)
+    print(f"{args.json}: builders agree")
+    shared = site_map_to_plantuml(real, "Site").splitlines()
+    assert page_lines(legacy.splitlines()) == page_lines(shared), "shared output lost or moved pages"
+    print(f"{args.json}: shared output keeps every page ({len(shared)} lines vs. {legacy.count(chr(10)) + 1})")
+
+    print(f"{'shape':>6} {'pages':>8} {'impl':>7} {'seconds':>9} {'us/page':>8} {'lines':>8}")
+    shapes = [("wide", int(x)) for x in args.pages.split(",")] + [("chain", args.chain_depth)]
+    for shape, pages in shapes:
+        site_map = synthetic_site_map(pages, args.fanout, chain=shape == "chain")
+        graph = lambda sm: site_map_to_plantuml(sm, shared=False)  # the legacy builder has no shared components
+        for name, fn in (("legacy", legacy_site_map_to_plantuml), ("graph", graph)):
+            out, elapsed = timed(fn, site_map)
+            lines = "recursion" if out is None else out.count("\n") + 1
+            print(f"{shape:>6} {pages:>8} {name:>7} {elapsed:>9.3f} {elapsed / pages * 1e6:>8.1f} {lines:>8}")
+
+
+if __name__ == "__main__":
+    main()
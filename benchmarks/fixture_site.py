@@ -0,0 +1,202 @@
+"""
+Synthetic site served from a local HTTP server, for offline crawler benchmarks.
+
+Page `/p/<n>` links to pages `n*fanout+1 .. n*fanout+fanout` (a complete tree),
+so a site of `pages` pages is fully reachable from `/`. `page_bytes` pads every
+page with body text up to that size and `forms` adds template forms (a search
+and a login form, then generic ones) to every page.
+
+With `site_map`, a finished crawl (either crawler's schema, e.g. the checked-in
+site_structure.json) is replayed instead: each page is served at its own path and
+query, rendered with `render_site_map_page`, with same-host links made relative.
+Pages are also served at their canonical spelling (dedup.py) when no other page
+has it, since crawls record links like `/about-us` that were served from
+`/index.php/about-us`; links the crawl never followed are served as leaf pages.
+"""
+
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from dedup import UrlCanonicalizer
+
+_FILLER = ("<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+           "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam.</p>")
+
+
+def render_form(i: int) -> str:
+    if i == 0:
+        return ('<form action="/search" method="GET"><input type="text" name="q" placeholder="Search">'
+                "<button>Go</button></form>")
+    if i == 1:
+        return ('<form action="/login" method="POST"><input type="text" name="username">'
+                '<input type="password" name="password"><input type="hidden" name="token" value="x">'
+                "<button>Log in</button></form>")
+    return (f'<form action="/form/{i}" method="POST"><input type="text" name="field{i}">'
+            f'<textarea name="message{i}"></textarea><button>Send</button></form>')
+
+
+def render_page(n: int, pages: int, fanout: int, page_bytes: int = 0, forms: int = 0) -> str:
+    children = [c for c in range(n * fanout + 1, n * fanout + fanout + 1) if c < pages]
+    links = "\n".join(f'<li><a href="/p/{c}">Page {c}</a></li>' for c in children)
+    head = (
+        "<!doctype html><html><head>"
+        f"<title>Page {n}</title></head><body>"
+        f"<h1>Page {n}</h1><h2>Section {n}.1</h2><p>Body text for page {n}.</p>"
+        f"<ul>{links}</ul>" + "".join(render_form(i) for i in range(forms))
+    )
+    tail = "</body></html>"
+    missing = page_bytes - len(head) - len(tail)
+    filler = _FILLER * (missing // len(_FILLER) + 1) if missing > 0 else ""
+    return head + filler + tail
+
+
+def _local_path(url: str) -> str:
+    parts = urlsplit(url)
+    return (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+
+def replay_pages(site_map) -> dict:
+    """`{path?query: html}` for a crawled site map, links rewritten to the same paths."""
+    if not site_map:
+        return {}
+    host = urlsplit(next(iter(site_map))).netloc
+    canonicalize = UrlCanonicalizer(next(iter(site_map)))
+    pages, aliases = {}, {}
+    for url, meta in site_map.items():
+        links = [_local_path(l) for l in meta.get("links", []) if urlsplit(l).netloc == host]
+        html = render_site_map_page(url, dict(meta, links=links))
+        pages.setdefault(_local_path(url), html)
+        aliases.setdefault(_local_path(canonicalize.rules(url)), html)
+    for path, html in aliases.items():
+        pages.setdefault(path, html)
+    for meta in site_map.values():
+        for link in meta.get("links", []):
+            if urlsplit(link).netloc == host and _local_path(link) not in pages:
+                pages[_local_path(link)] = render_site_map_page(link, {"title": _local_path(link)})
+    return pages
+
+
+class FixtureSite:
+    """
+    Context manager running the synthetic site in a background thread.
+
+    `latency` is slept per request (server side) to mimic a remote host. With
+    `etags`, pages carry an ETag and If-None-Match is answered with 304.
+    """
+
+    def __init__(self, pages: int = 200, fanout: int = 5, latency: float = 0.0,
+                 robots_txt: str = "User-agent: *\nAllow: /\n", etags: bool = False,
+                 page_bytes: int = 0, forms: int = 0, site_map=None):
+        self.replay = replay_pages(site_map) if site_map is not None else None
+        self.pages = len(self.replay) if self.replay is not None else pages
+        self.page_bytes = page_bytes
+        self.forms = forms
+        self.robots_txt = robots_txt
+        self.etags = etags
+        self.overrides = {}  # path -> html, to simulate edited pages
+        self.fanout = fanout
+        self.latency = latency
+        self.requests = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.requests += 1
+                if site.latency:
+                    time.sleep(site.latency)
+                if self.path == "/robots.txt":
+                    return self._send(200, site.robots_txt, "text/plain")
+                if site.replay is not None:
+                    html = site.overrides.get(self.path) or site.replay.get(self.path)
+                    if html is None:
+                        return self._send(404, "not found", "text/plain")
+                    return self._send(200, html, "text/html")
+                if self.path in ("", "/"):
+                    n = 0
+                elif self.path.startswith("/p/") and self.path[3:].isdigit():
+                    n = int(self.path[3:])
+                else:
+                    return self._send(404, "not found", "text/plain")
+                if n >= site.pages:
+                    return self._send(404, "not found", "text/plain")
+                html = site.overrides.get(self.path) or render_page(n, site.pages, site.fanout,
+                                                                    site.page_bytes, site.forms)
+                if site.etags:
+                    etag = '"' + hashlib.md5(html.encode("utf-8")).hexdigest() + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    return self._send(200, html, "text/html", {"ETag": etag})
+                return self._send(200, html, "text/html")
+
+            def _send(self, status, body, ctype, headers=None):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", f"{ctype}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def render_site_map_page(url: str, meta: dict, filler_paragraphs: int = 20) -> str:
+    """
+    Realistic HTML for one crawled page record (site_structure.json schema): a nav
+    with the page's links, its forms, headings and some body text.
+    """
+    nav = "".join(f'<li><a href="{l}">{l.rsplit("/", 1)[-1] or "home"}</a></li>' for l in meta.get("links", []))
+    forms = []
+    for form in meta.get("forms", []):
+        fields = "".join(
+            f'<label>{inp.get("placeholder") or ""}<input type="{inp["type"]}" name="{inp["name"] or ""}"></label>'
+            for inp in form["inputs"]
+        )
+        buttons = "".join(f"<button>{b}</button>" for b in form["buttons"])
+        forms.append(f'<form action="{form["action"] or ""}" method="{form["method"]}">{fields}{buttons}'
+                     '<input type="hidden" name="token" value="x"></form>')
+    headings = "".join(f"<h{level}>{text}</h{level}>" for level, text in meta.get("headings", []))
+    filler = "".join(
+        f"<p>Paragraph {i} of {meta.get('title') or url}, with <b>inline</b> <i>markup</i> "
+        f"and a <span class='x'>span</span>.</p>" for i in range(filler_paragraphs)
+    )
+    return (
+        "<!doctype html><html><head>"
+        f"<meta charset='utf-8'><title>{meta.get('title') or url}</title>"
+        "<script>var x = '<h1>not a heading</h1>';</script></head><body>"
+        f"<header><nav><ul>{nav}</ul></nav></header>"
+        f"<main><h1>{meta.get('title') or url}</h1>{headings}{filler}</main>"
+        f"<aside>{''.join(forms)}</aside>"
+        f"<footer><ul>{nav}</ul></footer>"
+        "</body></html>"
+    )
@@ -0,0 +1,241 @@
+"""
+End-to-end offline benchmark suite: crawl, extraction, PlantUML conversion,
+encoding and Markdown export, against the local fixture site (benchmarks/
+fixture_site.py) and a replay of the checked-in site_structure.json. Nothing
+touches the network.
+
+Every benchmark runs `--repeat` times (crawls `--crawl-repeat` times); fast ones
+are looped until one run takes at least `--min-time` seconds, and the best time
+per call is what gets compared, since it is the least noisy. Results go to `--out` as
+JSON. With `--baseline` (an earlier `--out` file), each benchmark is compared with
+it and the run exits with status 1 if one got more than `--threshold` slower.
+
+    python -m benchmarks.run_benchmarks --out bench_baseline.json
+    python -m benchmarks.run_benchmarks --baseline bench_baseline.json --threshold 0.2
+    python -m benchmarks.run_benchmarks --only crawl --pages 500 --latency 0.02
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from Crawl_site_BeautifulSoup import build_mindmap_chunks, crawl_site, export_markmap_markdown
+from benchmarks.fixture_site import FixtureSite, render_page, replay_pages
+from crawl_metrics import CrawlMetrics, configure_logging
+from mindmap_export import graph_to_markdown, graph_to_plantuml
+from page_extract import available_backends, extract_page
+from plantuml_encoding import plantuml_encode
+from site_graph import SiteGraph
+
+FORMAT = "benchmark-results"
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def measure(fn, repeat: int, min_time: float = 0.0):
+    """
+    Time `fn` (which returns the number of items it processed) `repeat` times. A
+    call faster than `min_time` is looped, like timeit's autorange.
+    """
+    t0 = time.perf_counter()
+    items = fn()
+    first = time.perf_counter() - t0
+    number = 1 if first >= min_time else max(1, int(min_time / max(first, 1e-6)))
+    times = [first] if number == 1 else []
+    while len(times) < max(1, repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - t0) / number)
+    best = min(times)
+    return {
+        "best_s": round(best, 6),
+        "median_s": round(statistics.median(times), 6),
+        "runs": len(times),
+        "loops": number,
+        "items": items,
+        "ms_per_item": round(1000 * best / items, 4) if items else None,
+    }
+
+
+# ---------- benchmarks ----------
+def crawl_bench(site, args, stages: dict):
+    """BeautifulSoup crawl of a running FixtureSite; the stage medians are left in `stages`."""
+    def run():
+        metrics = CrawlMetrics()
+        site_map = crawl_site(site.url, max_pages=site.pages, delay=0, concurrency=args.concurrency,
+                              dedup=True, metrics=metrics, parse_workers=args.parse_workers)
+        stages.clear()
+        stages.update({stage: hist.summary()["p50_ms"] for stage, hist in metrics.stages.items()})
+        return len(site_map)
+    return run
+
+
+def suite(args, site_map, stack):
+    """
+    `(name, fn, repeat, extra)` for every benchmark; `extra` is filled in while it
+    runs. Fixture sites are entered on `stack` (a contextlib.ExitStack).
+    """
+    synthetic = dict(pages=args.pages, fanout=args.fanout, latency=args.latency,
+                     page_bytes=args.page_bytes, forms=args.forms)
+    html = list(replay_pages(site_map).values())
+    html += [render_page(n, args.pages, args.fanout, args.page_bytes, args.forms) for n in range(args.pages)]
+    graph = SiteGraph.from_site_map(site_map)
+    plantuml = graph_to_plantuml(graph)
+    chunks = [text for _, text in build_mindmap_chunks(site_map)]
+    tmp = tempfile.mkdtemp(prefix="mindmap-bench-")
+
+    def extract(backend):
+        for page in html:
+            extract_page(page, backend)
+        return len(html)
+
+    def convert_plantuml():
+        graph_to_plantuml(SiteGraph.from_site_map(site_map))
+        return len(site_map)
+
+    def convert_chunks():
+        build_mindmap_chunks(site_map)
+        return len(site_map)
+
+    def encode_full():
+        plantuml_encode(plantuml)
+        return plantuml.count("\n") + 1
+
+    def encode_chunks():
+        for text in chunks:
+            plantuml_encode(text)
+        return len(chunks)
+
+    def markdown_export():
+        export_markmap_markdown(site_map, os.path.join(tmp, "structure.md"))
+        return len(site_map)
+
+    def markdown_graph():
+        graph_to_markdown(graph, os.path.join(tmp, "graph.md"))
+        return len(graph)
+
+    benches = []
+    for name, options in (("crawl.synthetic", synthetic), ("crawl.replay", {"site_map": site_map})):
+        stages = {}
+        site = stack.enter_context(FixtureSite(**options))
+        benches.append((name, crawl_bench(site, args, stages), args.crawl_repeat, {"stage_p50_ms": stages}))
+    for backend in available_backends():
+        benches.append((f"extract.{backend}", lambda backend=backend: extract(backend), args.repeat, {}))
+    benches += [
+        ("convert.plantuml", convert_plantuml, args.repeat, {}),
+        ("convert.chunks", convert_chunks, args.repeat, {}),
+        ("encode.full", encode_full, args.repeat, {}),
+        ("encode.chunks", encode_chunks, args.repeat, {}),
+        ("markdown.export", markdown_export, args.repeat, {}),
+        ("markdown.graph", markdown_graph, args.repeat, {}),
+    ]
+    return benches
+
+
+# ---------- comparison ----------
+def compare(results: dict, baseline: dict, threshold: float):
+    """Rows `(name, best_s, baseline best_s, change)` and the names that regressed."""
+    rows, regressions = [], []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before.get("best_s"):
+            rows.append((name, result["best_s"], None, None))
+            continue
+        change = result["best_s"] / before["best_s"] - 1
+        rows.append((name, result["best_s"], before["best_s"], change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline crawler/converter benchmark suite")
+    parser.add_argument("--site-json", default="site_structure.json", help="Crawl to replay and convert")
+    parser.add_argument("--pages", type=int, default=200, help="Synthetic site: number of pages")
+    parser.add_argument("--fanout", type=int, default=5, help="Synthetic site: links per page")
+    parser.add_argument("--page-bytes", type=int, default=20000, help="Synthetic site: HTML size per page")
+    parser.add_argument("--forms", type=int, default=2, help="Synthetic site: forms per page")
+    parser.add_argument("--latency", type=float, default=0.005, help="Server-side latency per request (s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Crawler workers")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Crawler parse processes")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark (best one counts)")
+    parser.add_argument("--crawl-repeat", type=int, default=2, help="Runs per crawl benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Loop faster benchmarks up to this (s/run)")
+    parser.add_argument("--only", default=None, help="Comma-separated name prefixes, e.g. crawl,encode")
+    parser.add_argument("--out", default="bench_results.json", help="Results JSON")
+    parser.add_argument("--baseline", default=None, help="Earlier results JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slowdown vs. the baseline before a benchmark counts as a regression")
+    args = parser.parse_args()
+    configure_logging("ERROR")  # the crawlers' per-page lines would drown the table
+
+    with open(args.site_json, "r", encoding="utf-8") as f:
+        site_map = json.load(f)
+    only = tuple(args.only.split(",")) if args.only else None
+
+    results = {}
+    with contextlib.ExitStack() as stack:
+        for name, fn, repeat, extra in suite(args, site_map, stack):
+            if only and not name.startswith(only):
+                continue
+            results[name] = measure(fn, repeat, 0.0 if name.startswith("crawl.") else args.min_time)
+            results[name].update(extra)
+            r = results[name]
+            print(f"{name:<22} {r['items']:>6} items  best {r['best_s'] * 1000:>9.1f} ms  "
+                  f"median {r['median_s'] * 1000:>9.1f} ms  {r['ms_per_item'] or 0:>8.3f} ms/item")
+
+    params = {k: v for k, v in vars(args).items()
+              if k not in ("out", "baseline", "threshold", "only", "repeat", "crawl_repeat", "min_time")}
+    report = {
+        "format": FORMAT,
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "backends": list(available_backends()),
+        "params": params,
+        "results": results,
+    }
+    tmp = args.out + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, args.out)
+    print(f"[ok] results -> {args.out}")
+
+    if not args.baseline:
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("format") != FORMAT:
+        sys.exit(f"{args.baseline} is not a {FORMAT} file")
+    if baseline.get("params") != params:
+        print(f"[warn] parameters differ from the baseline's ({baseline.get('params')}); timings may not compare")
+    rows, regressions = compare(results, baseline, args.threshold)
+    print(f"\ncompared with {args.baseline} (commit {baseline.get('commit')}), threshold +{args.threshold:.0%}")
+    for name, best, before, change in rows:
+        if change is None:
+            print(f"{name:<22} {best * 1000:>9.1f} ms  (new)")
+            continue
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<22} {best * 1000:>9.1f} ms  vs {before * 1000:>9.1f} ms  {change:>+7.1%}{flag}")
+    if regressions:
+        sys.exit(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}: "
+                 + ", ".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+The frontier / journal / dedup loop shared by the three crawlers.
+
+A crawler supplies `visit(url, parent, depth)`, which fetches and parses one page
+and hands it to `CrawlLoop.store`; the loop runs the workers over one shared
+frontier (frontier.py), replays and checkpoints the stream (crawl_output.CrawlJournal)
+and merges aliases and near-duplicates into the page already stored (dedup.py).
+
+    crawl = CrawlLoop(Frontier(order="bfs"), max_pages, journal=journal, deduper=deduper)
+    crawl.start(start_url)              # replays an interrupted run first
+    try:
+        await crawl.run(visit, workers=4)
+    finally:
+        crawl.close()
+"""
+
+import asyncio
+import logging
+
+from crawl_metrics import CrawlMetrics
+
+log = logging.getLogger(__name__)
+
+LIMITS = ("visits", "urls")
+
+
+class CrawlLoop:
+    """
+    `limit` is what `max_pages` caps:
+      - "visits" at most `max_pages` pages are popped and visited (the browser crawlers)
+      - "urls"   links stop being queued once `max_pages` URLs were seen
+                 (Crawl_site_BeautifulSoup, whose sitemap seeds count too)
+    Stored pages are kept in `site_map` unless they are streamed to `journal`;
+    `keep=True` keeps them in both.
+    """
+
+    def __init__(self, frontier, max_pages: int, journal=None, deduper=None, graph=None,
+                 metrics: CrawlMetrics = None, limit: str = "visits", keep: bool = False):
+        if limit not in LIMITS:
+            raise ValueError(f"limit must be one of {LIMITS}")
+        self.journal = journal
+        self.frontier = journal.frontier(frontier) if journal else frontier  # seen == visited + queued
+        self.max_pages = max_pages
+        self.deduper = deduper
+        self.graph = graph
+        self.metrics = metrics or CrawlMetrics()
+        self.limit = limit
+        self.keep = keep or journal is None
+        self.site_map = {}
+        self.done = set()    # urls stored (replayed from the stream, or crawled under another alias)
+        self.active = {}     # url -> frontier item, popped but not finished
+        self.visited = 0
+        self.pages = 0
+        self.completed = False
+        self._progress = asyncio.Event()
+
+    def start(self, start_url: str):
+        """Replay an interrupted run's stream, open the journal and queue `start_url` (as given)."""
+        if self.journal:
+            for url, record in self.journal.replay():
+                self.done.add(url)
+                self.frontier.mark_seen(url)
+                if self.keep:
+                    self.site_map[url] = record
+                if self.graph is not None:
+                    self.graph.add_record(url, record)
+                # links found after the last checkpoint
+                self.queue(record["links"], parent=url)
+            self.visited = self.journal.counter("visited") + len(self.done) - self.journal.counter("pages")
+            self.pages = len(self.done)
+            if self.journal.resume:
+                log.info("[resume] %s pages already crawled, %s queued", self.pages, len(self.frontier))
+            self.journal.open()
+        self.frontier.push(start_url)
+
+    def full(self) -> bool:
+        return self.limit == "urls" and len(self.frontier.seen) >= self.max_pages
+
+    def queue(self, links, parent: str = None, depth: int = 0) -> int:
+        """Push `links` until the limit is reached; returns how many were queued."""
+        queued = 0
+        for l in links:
+            if self.full():
+                break
+            queued += self.frontier.push(l, parent=parent, depth=depth)
+        return queued
+
+    def admit(self, url: str, declared: str = None, text: str = None, fingerprint=None):
+        """
+        URL to store the page fetched from `url` under (its `declared` rel=canonical
+        URL, see PageDeduplicator.resolve), or None when it merges into a stored page:
+        an alias of one, or a near-duplicate of its `text` / `fingerprint`. Without
+        either, only the canonical URL is checked.
+        """
+        if not self.deduper:
+            return url
+        key = self.deduper.resolve(url, declared)
+        if key != url:
+            self.frontier.mark_seen(key)
+            if key in self.done:
+                log.info("[dedup] %s is an alias of %s", url, key)
+                self.metrics.incr("dedup_aliases")
+                return None
+            url = key
+        if text is not None or fingerprint is not None:
+            with self.metrics.timer("dedup"):
+                original = self.deduper.near_duplicate(url, text, fingerprint=fingerprint)
+            if original:
+                log.info("[dedup] %s is a near-duplicate of %s", url, original)
+                self.metrics.incr("dedup_near_duplicates")
+                return None
+        return url
+
+    def store(self, url: str, record: dict, key: str = None):
+        """
+        Store the page popped as `url` under `key` (from `admit`, default `url`):
+        add it to the graph, queue its links and write it to the journal or `site_map`.
+        """
+        key = key or url
+        _, parent, depth = self.active[url]
+        self.done.add(key)
+        self.pages += 1
+        self.metrics.page_done()
+        if self.graph is not None:
+            self.graph.add_record(key, record, parent=parent)
+        self.queue(record["links"], parent=key, depth=depth + 1)
+        if self.keep:
+            self.site_map[key] = record
+        if self.journal:
+            in_flight = [item for u, item in self.active.items() if u != url]
+            with self.metrics.timer("journal"):
+                self.journal.record(key, record, self.frontier, in_flight,
+                                    visited=self.visited - len(in_flight), pages=self.pages)
+
+    def _more(self) -> bool:
+        return self.limit == "urls" or self.visited < self.max_pages
+
+    async def _worker(self, visit):
+        while True:
+            self.metrics.sample_queue(len(self.frontier), len(self.active))
+            if self.frontier and self._more():
+                item = self.frontier.pop()
+                url, parent, depth = item
+                if url in self.done:  # already streamed before a resume
+                    continue
+                self.visited += 1
+                self.active[url] = item
+                try:
+                    await visit(url, parent, depth)
+                finally:
+                    self._progress.set()
+                # only finished pages leave `active`, so an interrupted one is checkpointed as pending
+                del self.active[url]
+            elif self.active and self._more():
+                # another worker may still discover links
+                self._progress.clear()
+                await self._progress.wait()
+            else:
+                return
+
+    async def run(self, visit, workers: int = 1):
+        """Run `workers` workers calling `visit(url, parent, depth)` until the frontier is drained."""
+        tasks = [asyncio.create_task(self._worker(visit)) for _ in range(max(1, workers))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        self.completed = True
+
+    def close(self):
+        """Final checkpoint (pages still in flight are saved as pending) and queue sample."""
+        if self.journal:
+            self.journal.close(self.frontier, self.active.values(), complete=self.completed,
+                               visited=self.visited - len(self.active), pages=self.pages)
+        self.metrics.sample_queue(len(self.frontier), len(self.active), force=True)
@@ -0,0 +1,238 @@
+"""
+Crawl instrumentation: per-stage latency histograms, counters, bytes fetched,
+HTTP status counts, queue depth over time and pages/second for one run.
+
+The crawlers take a `CrawlMetrics` (they make their own if none is given), count
+status codes, bytes and events in it, sample the queue depth, log `log_summary()`
+at the end and time each stage of a page:
+
+- BeautifulSoup crawler: robots, politeness_wait, ttfb (`resp.elapsed`: DNS,
+  connect, request and waiting for the headers), download (the rest of the GET,
+  i.e. reading the body), parse, parse_wait (queued for a parse process, with
+  --parse-workers), dedup, cache_io, journal
+- Playwright crawler: navigate, extract, dedup, journal, plus dns / connect /
+  ttfb / download from the browser's Navigation Timing entry
+- hybrid crawler: the BeautifulSoup stages, plus navigate and extract for the
+  pages rendered in the browser
+- PlantUML: encode and render (see plantuml_render.render_diagrams)
+
+`report()` is a JSON-ready dict (written with `write_report`); `prometheus()` is the
+same data in the Prometheus text exposition format.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+# seconds; a page stage takes anywhere from microseconds (dedup) to a minute (navigate)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def configure_logging(level: str = "INFO"):
+    """Plain `[tag] message` lines on stdout, like the print()s they replace."""
+    logging.basicConfig(level=getattr(logging, level.upper()), format="%(message)s", stream=sys.stdout)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus style) with count, sum, min and max."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate, interpolated inside the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                value = lower + (upper - lower) * (rank - seen) / n
+                return min(max(value, self.min), self.max)
+            seen += n
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_s": round(self.sum, 6),
+            "mean_ms": round(1000 * self.sum / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(1000 * self.quantile(0.5), 3),
+            "p90_ms": round(1000 * self.quantile(0.9), 3),
+            "p99_ms": round(1000 * self.quantile(0.99), 3),
+            "max_ms": round(1000 * (self.max or 0.0), 3),
+            "buckets": {("+Inf" if i == len(self.bounds) else str(self.bounds[i])): n
+                        for i, n in enumerate(self.counts)},
+        }
+
+
+class CrawlMetrics:
+    """
+    Metrics of one run. Safe to update from worker threads. `queue_interval` is the
+    minimum number of seconds between two queue-depth samples.
+    """
+
+    def __init__(self, name: str = "crawl", queue_interval: float = 0.5):
+        self.name = name
+        self.queue_interval = queue_interval
+        self.started = time.monotonic()
+        self.started_at = time.time()
+        self.finished = None
+        self.stages = {}         # stage -> Histogram
+        self.counters = {}       # event -> count
+        self.status_codes = {}   # HTTP status (str) -> count
+        self.bytes_fetched = 0
+        self.pages = 0
+        self.queue_depth = []    # [seconds since start, queued, in flight]
+        self._last_sample = None
+        self._lock = threading.Lock()
+
+    # ---------- recording ----------
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """`with metrics.timer("parse"): ...` (works around awaits too)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def incr(self, event: str, n: int = 1):
+        with self._lock:
+            self.counters[event] = self.counters.get(event, 0) + n
+
+    def response(self, status, size: int = 0):
+        """One HTTP response: its status code and body size in bytes."""
+        with self._lock:
+            key = str(status)
+            self.status_codes[key] = self.status_codes.get(key, 0) + 1
+            self.bytes_fetched += size or 0
+
+    def page_done(self):
+        with self._lock:
+            self.pages += 1
+
+    def sample_queue(self, queued: int, in_flight: int = 0, force: bool = False):
+        now = time.monotonic() - self.started
+        if force or self._last_sample is None or now - self._last_sample >= self.queue_interval:
+            self._last_sample = now
+            self.queue_depth.append([round(now, 3), queued, in_flight])
+
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.monotonic()
+
+    # ---------- reporting ----------
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def pages_per_second(self) -> float:
+        return self.pages / self.elapsed if self.elapsed > 0 else 0.0
+
+    def report(self) -> dict:
+        return {
+            "name": self.name,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_at)),
+            "duration_s": round(self.elapsed, 3),
+            "pages": self.pages,
+            "pages_per_s": round(self.pages_per_second(), 3),
+            "bytes_fetched": self.bytes_fetched,
+            "status_codes": dict(sorted(self.status_codes.items())),
+            "counters": dict(sorted(self.counters.items())),
+            "stages": {stage: hist.summary() for stage, hist in self.stages.items()},
+            "queue_depth": self.queue_depth,
+        }
+
+    def write_report(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        os.replace(tmp, path)
+        log.info("[metrics] run report -> %s", path)
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format (metric names prefixed `<name>_`)."""
+        p = self.name
+        lines = [f"# TYPE {p}_stage_seconds histogram"]
+        for stage, hist in self.stages.items():
+            cumulative = 0
+            for i, n in enumerate(hist.counts):
+                cumulative += n
+                le = "+Inf" if i == len(hist.bounds) else repr(float(hist.bounds[i]))
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {hist.sum:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+        lines.append(f"# TYPE {p}_pages_total counter")
+        lines.append(f"{p}_pages_total {self.pages}")
+        lines.append(f"# TYPE {p}_bytes_fetched_total counter")
+        lines.append(f"{p}_bytes_fetched_total {self.bytes_fetched}")
+        lines.append(f"# TYPE {p}_http_responses_total counter")
+        for code, n in sorted(self.status_codes.items()):
+            lines.append(f'{p}_http_responses_total{{code="{code}"}} {n}')
+        lines.append(f"# TYPE {p}_events_total counter")
+        for event, n in sorted(self.counters.items()):
+            lines.append(f'{p}_events_total{{event="{event}"}} {n}')
+        queued, in_flight = self.queue_depth[-1][1:] if self.queue_depth else (0, 0)
+        lines.append(f"# TYPE {p}_queue_depth gauge")
+        lines.append(f"{p}_queue_depth {queued}")
+        lines.append(f"# TYPE {p}_in_flight gauge")
+        lines.append(f"{p}_in_flight {in_flight}")
+        lines.append(f"# TYPE {p}_pages_per_second gauge")
+        lines.append(f"{p}_pages_per_second {self.pages_per_second():.3f}")
+        lines.append(f"# TYPE {p}_duration_seconds gauge")
+        lines.append(f"{p}_duration_seconds {self.elapsed:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+        log.info("[metrics] Prometheus metrics -> %s", path)
+
+    def write(self, report: str = None, prometheus: str = None):
+        """Write whichever of the JSON report and the Prometheus dump has a path."""
+        if report:
+            self.write_report(report)
+        if prometheus:
+            self.write_prometheus(prometheus)
+
+    def log_summary(self, logger=log):
+        logger.info("[metrics] %s pages in %.1f s (%.2f pages/s), %.2f MB, status %s",
+                    self.pages, self.elapsed, self.pages_per_second(), self.bytes_fetched / 1e6,
+                    dict(sorted(self.status_codes.items())))
+        for stage, hist in sorted(self.stages.items(), key=lambda item: -item[1].sum):
+            s = hist.summary()
+            logger.info("[metrics]   %-16s n=%-6s total %8.2f s  p50 %.1f ms  p90 %.1f ms  max %.1f ms",
+                        stage, s["count"], hist.sum, s["p50_ms"], s["p90_ms"], s["max_ms"])
@@ -0,0 +1,236 @@
+"""
+Streaming crawl output and checkpoints.
+
+- `PageStream` appends one JSON line per crawled page (`{"url": ..., "page": {...}}`)
+  and flushes it immediately, so a crash loses at most the page being written.
+- `Checkpoint` periodically saves the frontier (pending + seen) with an atomic
+  write-then-rename; `--resume` restores it and replays the stream.
+- `JsonlSiteMap` is a read-only mapping over a JSONL file that keeps only
+  url -> file offset in memory, so the converters can read a huge crawl lazily.
+  `load_site_map` returns one for `.jsonl` paths and a plain dict for `.json`;
+  `open_site_map` does the same in a `with` block and closes the file after.
+"""
+
+import json
+import os
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+from frontier import Frontier
+
+
+def is_stream_path(path: str) -> bool:
+    return bool(path) and path.endswith(".jsonl")
+
+
+def checkpoint_path(stream_path: str) -> str:
+    return stream_path + ".checkpoint.json"
+
+
+class PageStream:
+    """Append-only JSONL writer. With `append=True` an interrupted file is continued."""
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        if append and os.path.exists(path):
+            _drop_partial_last_line(path)
+        self._f = open(path, "a" if append else "w", encoding="utf-8")
+        self.written = 0
+
+    def write(self, url: str, page: dict):
+        self._f.write(json.dumps({"url": url, "page": page}, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self.written += 1
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _drop_partial_last_line(path: str):
+    """Truncate a half-written final record left by a crash."""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = size - 1
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            idx = chunk.rfind(b"\n")
+            if idx != -1:
+                f.truncate(pos - step + idx + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+def iter_records(path: str):
+    """Yield `(url, page)` from a JSONL crawl, skipping a torn final line."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            rec = json.loads(line)
+            yield rec["url"], rec["page"]
+
+
+class Checkpoint:
+    """Atomic JSON snapshot of the crawl state (frontier, counters)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def save(self, state: dict):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+class JsonlSiteMap(Mapping):
+    """
+    Lazy `{url: page}` view of a JSONL crawl. Only the url -> offset index is held
+    in memory; pages are read from disk on access. Later lines win for repeated URLs
+    (a resumed crawl may re-write a page).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offsets = {}
+        for offset, line in self._lines():
+            self._offsets[_record_url(line)] = offset
+        self._f = open(path, "rb")
+
+    def _lines(self):
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                yield offset, line
+                offset += len(line)
+
+    def __getitem__(self, url: str) -> dict:
+        self._f.seek(self._offsets[url])
+        return json.loads(self._f.readline())["page"]
+
+    def __iter__(self):
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __contains__(self, url) -> bool:
+        return url in self._offsets
+
+    def items(self):
+        """Sequential scan (in crawl order) instead of one seek per key."""
+        for offset, line in self._lines():
+            rec = json.loads(line)
+            if self._offsets.get(rec["url"]) == offset:
+                yield rec["url"], rec["page"]
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_URL_PREFIX = b'{"url": '
+_decoder = json.JSONDecoder()
+
+
+def _record_url(line: bytes) -> str:
+    # PageStream always writes "url" first, so only that string needs decoding
+    if line.startswith(_URL_PREFIX):
+        return _decoder.raw_decode(line[len(_URL_PREFIX):].decode("utf-8"))[0]
+    return json.loads(line)["url"]
+
+
+def load_site_map(path: str):
+    """dict for a `.json` crawl, lazy `JsonlSiteMap` for a `.jsonl` stream."""
+    if is_stream_path(path):
+        return JsonlSiteMap(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@contextmanager
+def open_site_map(path: str):
+    """`load_site_map` for a `with` block; a JsonlSiteMap's file is closed at the end."""
+    site_map = load_site_map(path)
+    try:
+        yield site_map
+    finally:
+        if isinstance(site_map, JsonlSiteMap):
+            site_map.close()
+
+
+class CrawlJournal:
+    """
+    Stream + checkpoint of one crawl, driven by crawl_loop.CrawlLoop:
+
+        journal = CrawlJournal("crawl.jsonl", resume=args.resume)
+        frontier = journal.frontier(Frontier(...))   # checkpointed frontier, if any
+        for url, page in journal.replay(): ...        # pages the interrupted run wrote
+        journal.open()
+        journal.record(url, page, frontier, in_flight)  # per page; checkpoints every `every`
+        journal.close(frontier)
+    """
+
+    def __init__(self, path: str, resume: bool = False, every: int = 50):
+        self.path = path
+        self.resume = resume
+        self.every = max(1, every)
+        self.checkpoint = Checkpoint(checkpoint_path(path))
+        self.state = self.checkpoint.load() if resume else None
+        self.stream = None
+
+    def frontier(self, default):
+        if self.state:
+            return Frontier.restore(self.state["frontier"], max_size=default.max_size)
+        return default
+
+    def counter(self, name: str, default=0):
+        return (self.state or {}).get(name, default)
+
+    def replay(self):
+        if self.resume and os.path.exists(self.path):
+            yield from iter_records(self.path)
+
+    def open(self):
+        self.stream = PageStream(self.path, append=self.resume)
+
+    def record(self, url: str, page: dict, frontier, in_flight=(), **counters):
+        self.stream.write(url, page)
+        if self.stream.written % self.every == 0:
+            self.save(frontier, in_flight, **counters)
+
+    def save(self, frontier, in_flight=(), complete: bool = False, **counters):
+        self.checkpoint.save({"frontier": frontier.snapshot(in_flight), "complete": complete, **counters})
+
+    def close(self, frontier, in_flight=(), complete: bool = True, **counters):
+        self.save(frontier, in_flight, complete=complete, **counters)
+        self.stream.close()
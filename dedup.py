@@ -0,0 +1,242 @@
+"""
+URL-alias and near-duplicate page collapsing, shared by the crawlers (`dedup=True`).
+
+- `UrlCanonicalizer` maps the many spellings of one page to a single URL: lower-case
+  scheme/host, no default port or fragment, `index.php` (Joomla's `/index.php/x`)
+  and other index files removed, no trailing slash, tracking parameters (utm_*,
+  fbclid, ...) and print-view parameters (`?tmpl=component&print=1&layout=default`)
+  dropped, remaining query parameters sorted, http/https of the start host unified.
+  Aliases learned from `<link rel=canonical>` or duplicate content are applied too.
+- `simhash` fingerprints page text; `SimhashIndex` finds a page within a few bits.
+- `PageDeduplicator` is what the crawlers use (through crawl_loop.CrawlLoop.admit):
+  links are canonicalized before they are queued, and a fetched page that declares
+  another canonical URL, or whose text is a near-duplicate of a page already
+  crawled, is merged instead of recorded. The site map is then keyed by canonical
+  URLs (the root keeps its "/", query strings are cleaned), which is why
+  Crawl_site_BeautifulSoup.crawl_site leaves it off unless asked.
+- `collapse_site_map` applies the URL rules to a finished crawl before rendering.
+"""
+
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "_hsenc", "_hsmkt", "ref_src",
+})
+TRACKING_PREFIXES = ("utm_",)
+# dropped only from print views, where they select the printable template
+PRINT_PARAMS = frozenset({"print", "tmpl", "layout", "format"})
+INDEX_FILES = frozenset({"index.php", "index.html", "index.htm", "default.aspx"})
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _is_print_view(params) -> bool:
+    return any(k == "print" or (k == "tmpl" and v == "component") or (k == "format" and v == "print")
+               for k, v in params)
+
+
+class UrlCanonicalizer:
+    """
+    Callable: `canonicalize(url, base=None)`. With `start_url`, links to the start
+    host over the other scheme (http vs https) are mapped to the start URL's scheme.
+    """
+
+    def __init__(self, start_url: str = None, strip_index: bool = True, drop_tracking: bool = True,
+                 drop_print: bool = True):
+        self.strip_index = strip_index
+        self.drop_tracking = drop_tracking
+        self.drop_print = drop_print
+        self.schemes = {}
+        if start_url:
+            parts = urlsplit(start_url)
+            self.schemes[(parts.hostname or "").lower()] = parts.scheme.lower()
+        self.aliases = {}
+
+    def add_alias(self, alias: str, canonical: str):
+        if alias != canonical:
+            self.aliases[alias] = canonical
+
+    def __call__(self, url: str, base: str = None) -> str:
+        if base:
+            url = urljoin(base, url)
+        canonical = self.rules(url)
+        return self.aliases.get(canonical, canonical)
+
+    def rules(self, url: str) -> str:
+        """The URL rules alone, without learned aliases."""
+        parts = urlsplit(url.strip())
+        original = parts.scheme.lower()
+        host = (parts.hostname or "").lower()
+        if original not in DEFAULT_PORTS:
+            return url.split("#")[0]
+        scheme = self.schemes.get(host, original)
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        default = port in (None, DEFAULT_PORTS[original], DEFAULT_PORTS[scheme])
+        netloc = host if default else f"{host}:{port}"
+
+        segments = [s for s in parts.path.split("/") if s]
+        if self.strip_index:
+            segments = [s for s in segments if s.lower() not in INDEX_FILES]
+        path = "/" + "/".join(segments)
+
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        if self.drop_tracking:
+            params = [(k, v) for k, v in params
+                      if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)]
+        if self.drop_print and _is_print_view(params):
+            params = [(k, v) for k, v in params if k.lower() not in PRINT_PARAMS]
+        query = urlencode(sorted(params))
+        return urlunsplit((scheme, netloc, path, query, ""))
+
+
+# ---------- content fingerprints ----------
+_INVISIBLE = re.compile(r"<(script|style|noscript|template)\b.*?</\1\s*>|<!--.*?-->", re.S | re.I)
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"\w+")
+
+
+def visible_text(html: str) -> str:
+    """Rough page text: tags, scripts, styles and comments removed."""
+    return _TAG.sub(" ", _INVISIBLE.sub(" ", html))
+
+
+def words_of(text: str):
+    return _WORD.findall(text.lower())
+
+
+def simhash(text: str, shingle: int = 3, words=None) -> int:
+    """64-bit simhash of the word `shingle`-grams of `text` (0 for empty text)."""
+    if words is None:
+        words = words_of(text)
+    if not words:
+        return 0
+    features = {" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))}
+    # one 64-char bit string per feature; zip(*) turns them into per-bit columns in C
+    bits = [format(int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+            for f in features]
+    half = len(bits) / 2
+    return int("".join("1" if column.count("1") > half else "0" for column in zip(*bits)), 2)
+
+
+def text_fingerprint(text: str):
+    """`(word count, simhash)` of `text`; what `PageDeduplicator.near_duplicate` compares."""
+    words = words_of(text)
+    return len(words), simhash(text, words=words)
+
+
+def html_fingerprint(html: str):
+    """`text_fingerprint` of a page's visible text (picklable, for parse worker processes)."""
+    return text_fingerprint(visible_text(html))
+
+
+class SimhashIndex:
+    """
+    Fingerprints within `max_distance` bits of each other are near-duplicates. The
+    64 bits are split into `max_distance + 1` bands; two such fingerprints agree on
+    at least one whole band, so only pages sharing a band are compared.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self._width = 64 // self.bands
+        self._buckets = {}
+
+    def _keys(self, fp: int):
+        mask = (1 << self._width) - 1
+        return [(i, (fp >> (i * self._width)) & mask) for i in range(self.bands)]
+
+    def near(self, fp: int):
+        """Key of an indexed fingerprint within `max_distance` bits, or None."""
+        for key in self._keys(fp):
+            for other, value in self._buckets.get(key, ()):
+                if (other ^ fp).bit_count() <= self.max_distance:
+                    return value
+        return None
+
+    def add(self, fp: int, value):
+        for key in self._keys(fp):
+            self._buckets.setdefault(key, []).append((fp, value))
+
+
+class PageDeduplicator:
+    """
+    Per-crawl state: the canonicalizer (`dedup.canonicalize(url, base)`), the
+    fingerprint index and counters. Pages with fewer than `min_words` words are not
+    fingerprinted, since short pages are too alike to compare.
+    """
+
+    def __init__(self, start_url: str = None, max_distance: int = 3, min_words: int = 50):
+        self.canonicalize = UrlCanonicalizer(start_url)
+        self.index = SimhashIndex(max_distance)
+        self.min_words = min_words
+        self.canonical_aliases = 0
+        self.near_duplicates = 0
+
+    def resolve(self, url: str, declared: str = None) -> str:
+        """
+        URL to record a page fetched from `url` under. A `<link rel=canonical>` on the
+        same host wins, and `url` becomes an alias of it.
+        """
+        if not declared:
+            return url
+        canonical = self.canonicalize(declared, base=url)
+        if canonical == url or urlsplit(canonical).netloc != urlsplit(url).netloc:
+            return url
+        self.canonicalize.add_alias(url, canonical)
+        self.canonical_aliases += 1
+        return canonical
+
+    def near_duplicate(self, url: str, text: str = None, fingerprint=None):
+        """
+        URL of an already crawled page whose text is a near-duplicate of `text` (and
+        `url` becomes its alias), or None after remembering this page. A
+        `fingerprint` computed elsewhere (`text_fingerprint`) can stand in for `text`.
+        """
+        count, fp = fingerprint or text_fingerprint(text)
+        if count < self.min_words:
+            return None
+        original = self.index.near(fp)
+        if original is not None and original != url:
+            self.canonicalize.add_alias(url, original)
+            self.near_duplicates += 1
+            return original
+        self.index.add(fp, url)
+        return None
+
+    def stats(self) -> dict:
+        return {"url_aliases": len(self.canonicalize.aliases), "rel_canonical": self.canonical_aliases,
+                "near_duplicates": self.near_duplicates}
+
+
+def collapse_site_map(site_map, canonicalize: UrlCanonicalizer = None):
+    """
+    Merge pages of a finished crawl (either crawler's schema) whose URLs canonicalize
+    to the same page. The first page crawled wins; links of merged pages are added
+    to it. Links and parents are rewritten to canonical URLs. Returns
+    `(collapsed, merged)` where `merged` maps each dropped URL to the kept one.
+    """
+    collapsed, merged = {}, {}
+    for url, page in site_map.items():
+        if canonicalize is None:
+            canonicalize = UrlCanonicalizer(url)
+        key = canonicalize(url)
+        links = list(dict.fromkeys(canonicalize(l) for l in page.get("links", [])))
+        if key in collapsed:
+            merged[url] = key
+            kept = collapsed[key]
+            kept["links"] = list(dict.fromkeys(kept["links"] + links))
+            continue
+        page = dict(page, links=links)
+        if "url" in page:
+            page["url"] = key
+        if page.get("parent") is not None:
+            parent = canonicalize(page["parent"])
+            page["parent"] = None if parent == key else parent
+        collapsed[key] = page
+    return collapsed, merged
@@ -0,0 +1,105 @@
+"""
+Crawl frontier shared by both crawlers.
+
+Pending URLs live in a deque (BFS / DFS) or a heap (best-first), and every URL that
+was ever admitted is remembered in a `seen` set, so push/pop/dedup are all O(1)
+(O(log n) for best-first) instead of the old `list.pop(0)` / `l not in to_visit` scans.
+"""
+
+import heapq
+import itertools
+from collections import deque
+from urllib.parse import urlparse
+
+ORDERS = ("bfs", "dfs", "best-first")
+
+
+def url_depth(url: str) -> int:
+    """Number of path segments: `/` -> 0, `/a/b` -> 2."""
+    return len([seg for seg in urlparse(url).path.split("/") if seg])
+
+
+class Frontier:
+    """
+    `order`:
+      - "bfs"        first in, first out (Crawl_site_BeautifulSoup default)
+      - "dfs"        last in, first out (Crawl_site_playwright default)
+      - "best-first" shallowest URL path first, FIFO among equals
+    `max_size` bounds the number of pending URLs; pushes beyond it are rejected
+    (counted in `dropped`) and are not marked as seen, so they can be found again later.
+    """
+
+    def __init__(self, order: str = "bfs", max_size: int = None):
+        if order not in ORDERS:
+            raise ValueError(f"order must be one of {ORDERS}")
+        self.order = order
+        self.max_size = max_size
+        self.seen = set()
+        self.dropped = 0
+        self._queue = [] if order == "best-first" else deque()
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def __bool__(self) -> bool:
+        return bool(self._queue)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.seen
+
+    def push(self, url: str, parent: str = None, depth: int = 0) -> bool:
+        """Queue `url` unless it was seen before or the frontier is full."""
+        if url in self.seen:
+            return False
+        if self.max_size is not None and len(self._queue) >= self.max_size:
+            self.dropped += 1
+            return False
+        self.seen.add(url)
+        self._enqueue(url, parent, depth)
+        return True
+
+    def _enqueue(self, url, parent, depth):
+        if self.order == "best-first":
+            heapq.heappush(self._queue, (url_depth(url), next(self._counter), url, parent, depth))
+        else:
+            self._queue.append((url, parent, depth))
+
+    def extend(self, urls, parent: str = None, depth: int = 0) -> int:
+        """Push many URLs; returns how many were queued."""
+        return sum(self.push(url, parent, depth) for url in urls)
+
+    def pop(self):
+        """Next `(url, parent, depth)`."""
+        if self.order == "best-first":
+            return heapq.heappop(self._queue)[2:]
+        if self.order == "dfs":
+            return self._queue.pop()
+        return self._queue.popleft()
+
+    def mark_seen(self, url: str):
+        """Remember `url` without queueing it (e.g. already crawled)."""
+        self.seen.add(url)
+
+    def snapshot(self, in_flight=()) -> dict:
+        """
+        JSON-able state for checkpoints. `in_flight` items (popped but not finished)
+        are saved as pending so a resumed crawl retries them.
+        """
+        in_flight = [list(e) for e in in_flight]
+        if self.order == "best-first":
+            pending = in_flight + [list(e[2:]) for e in sorted(self._queue)]
+        elif self.order == "dfs":
+            pending = [list(e) for e in self._queue] + in_flight  # popped from the end
+        else:
+            pending = in_flight + [list(e) for e in self._queue]
+        return {"order": self.order, "pending": pending, "seen": sorted(self.seen)}
+
+    @classmethod
+    def restore(cls, snapshot: dict, max_size: int = None) -> "Frontier":
+        frontier = cls(order=snapshot["order"], max_size=max_size)
+        frontier.seen = set(snapshot["seen"])
+        for url, parent, depth in snapshot["pending"]:
+            frontier.seen.add(url)
+            frontier._enqueue(url, parent, depth)
+        return frontier
@@ -0,0 +1,76 @@
+"""
+On-disk response cache for conditional re-crawls.
+
+One small JSON file per URL (`<cache_dir>/<sha1(url)>.json`) keeps the validators
+(ETag / Last-Modified), a hash of the body and the record extracted from it. On the
+next crawl the validators are sent as If-None-Match / If-Modified-Since; a 304, or a
+200 whose body hashes the same, reuses the stored record without parsing.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, cache_dir: str = ".crawl_cache"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.not_modified = 0   # 304 responses
+        self.unchanged = 0      # 200 with the same body hash
+        self.misses = 0         # new or changed pages
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str):
+        """Cached entry for `url`, or None."""
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def conditional_headers(entry) -> dict:
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, resp, digest: str, record: dict):
+        entry = {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "content_hash": digest,
+            "fetched_at": time.time(),
+            "record": record,
+        }
+        self._write(url, entry)
+
+    def refresh(self, url: str, entry: dict, resp=None):
+        """Re-store an unchanged entry with a new fetch time (and any new validators)."""
+        if resp is not None:
+            entry["etag"] = resp.headers.get("ETag") or entry.get("etag")
+            entry["last_modified"] = resp.headers.get("Last-Modified") or entry.get("last_modified")
+        entry["fetched_at"] = time.time()
+        self._write(url, entry)
+
+    def _write(self, url: str, entry: dict):
+        # write-then-rename so a crash never leaves a half-written entry
+        tmp = self._path(url) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, self._path(url))
+
+    def stats(self) -> dict:
+        return {"not_modified": self.not_modified, "unchanged": self.unchanged, "misses": self.misses}
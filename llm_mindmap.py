@@ -0,0 +1,346 @@
+"""
+AI-assisted mind map, batched: the crawl is split into subtrees that each fit one
+prompt, the subtrees not answered before are sent to an LLM in packed requests,
+concurrently, and the answers are stitched into one @startmindmap document.
+
+- Subtrees follow the crawl tree (site_graph.SiteGraph.walk): every crawl root's
+  subtree, if it fits `max_chars` of JSON. A bigger one is split: its root page
+  alone, then its children's subtrees one level deeper.
+- Each subtree is sent as the crawler JSON schema of prompt.txt, with parent=null
+  for its top page, and `prompt.txt` as the instructions. Subtrees still to be
+  answered are packed into requests of up to `max_chars`; an answer is cut back
+  into one answer per subtree at its top-level nodes. An answer that does not
+  split that way is asked again one subtree at a time.
+- Answers are cached on disk per subtree, by sha256(model + prompt + subtree JSON).
+  A changed page invalidates only the subtree it belongs to (the smallest one
+  listed above that contains it); every other subtree is answered from the cache,
+  however the requests are packed. Exceptions: a change that makes a subtree cross
+  `max_chars` regroups that subtree, and a page that gains or loses a child
+  changes its own record (its links) as well as the child's.
+- Stitching keeps only the `*` lines of each answer. It drops the answer's own root
+  and shifts the rest to the subtree's depth in the tree, clamping jumps of more
+  than one level so the result stays valid PlantUML.
+
+Clients: `OpenAIClient` (needs the openai package and OPENAI_API_KEY) and
+`MockLLMClient`, which follows prompt.txt's layout offline.
+
+    python llm_mindmap.py site_structure.json --client mock --out mindmap_llm.puml
+    python llm_mindmap.py site_structure.json --client openai --model gpt-4o-mini --svg mindmap_llm.svg
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from crawl_metrics import configure_logging
+from site_graph import load_graph
+
+log = logging.getLogger(__name__)
+
+MAX_BATCH_CHARS = 12000
+_STARS = re.compile(r"^(\*+)(_?\s.*)$")
+
+
+def _one_line(text) -> str:
+    return " ".join(str(text).split())
+
+
+# ---------- subtrees and requests ----------
+class Batch:
+    """Pages of one subtree rooted at `depth` (1 = crawl roots); the unit that is cached and stitched."""
+
+    def __init__(self, depth: int, pages: dict):
+        self.depth = depth
+        self.pages = pages  # url -> record (crawler schema)
+        self.text = json.dumps(pages, indent=1, ensure_ascii=False)
+
+    def key(self, *parts) -> str:
+        return hashlib.sha256("\0".join([*parts, self.text]).encode("utf-8")).hexdigest()
+
+
+def page_record(graph, uid: int, parent) -> dict:
+    rec = graph.record(uid)
+    url = graph.urls[uid]
+    return {"title": rec.title or url, "url": url, "parent": parent,
+            "links": [graph.urls[t] for t in graph.link_ids(uid)], "forms": list(rec.forms)}
+
+
+def split_subtrees(graph, max_chars: int = MAX_BATCH_CHARS) -> list:
+    """
+    One Batch per subtree that fits `max_chars`, in pre-order, so the stitched answers
+    nest like the crawl tree. A bigger subtree gives a Batch of its root page alone,
+    followed by its children's subtrees one level deeper.
+    """
+    children = graph.children_index()
+    order = [(uid, depth) for depth, uid, _ in graph.walk()]
+    total = {}
+    for uid, _ in reversed(order):
+        own = len(json.dumps(page_record(graph, uid, graph.urls[uid]), ensure_ascii=False))
+        total[uid] = own + sum(total.get(c, 0) for c in children.get(uid, ()))
+
+    def subtree(uid):
+        pages, stack = {}, [(uid, None)]
+        while stack:
+            u, p = stack.pop()
+            pages[graph.urls[u]] = page_record(graph, u, p)
+            stack.extend((c, graph.urls[u]) for c in reversed(children.get(u, ())))
+        return pages
+
+    subtrees, stack = [], [(uid, 1) for uid in reversed(graph.roots())]
+    while stack:
+        uid, depth = stack.pop()
+        if total[uid] <= max_chars:
+            subtrees.append(Batch(depth, subtree(uid)))
+        else:
+            subtrees.append(Batch(depth, {graph.urls[uid]: page_record(graph, uid, None)}))
+            stack.extend((c, depth + 1) for c in reversed(children.get(uid, ())))
+    return subtrees
+
+
+def pack_requests(subtrees, max_chars: int = MAX_BATCH_CHARS) -> list:
+    """Index lists of `subtrees` that go into one request each, up to `max_chars` of JSON."""
+    requests, group, size = [], [], 0
+    for i, subtree in enumerate(subtrees):
+        if group and size + len(subtree.text) > max_chars:
+            requests.append(group)
+            group, size = [], 0
+        group.append(i)
+        size += len(subtree.text)
+    if group:
+        requests.append(group)
+    return requests
+
+
+# ---------- clients ----------
+class MockLLMClient:
+    """Offline stand-in: renders the batch JSON in prompt.txt's layout, no model involved."""
+
+    model = "mock"
+
+    def complete(self, instructions: str, batch_json: str) -> str:
+        pages = json.loads(batch_json)
+        children = {}
+        for url, page in pages.items():
+            children.setdefault(page["parent"] if page["parent"] in pages else None, []).append(url)
+        lines = ["@startmindmap", "* Site Mind Map"]
+        stack = [(url, 2) for url in reversed(children.get(None, []))]
+        while stack:
+            url, level = stack.pop()
+            page = pages[url]
+            lines.append(f"{'*' * level} {_one_line(page['title'])} ({url})")
+            if page["links"]:
+                lines.append(f"{'*' * (level + 1)} Links")
+                lines.extend(f"{'*' * (level + 2)} {link}" for link in page["links"])
+            if page["forms"]:
+                lines.append(f"{'*' * (level + 1)} Forms")
+            for i, form in enumerate(page["forms"], 1):
+                lines.append(f"{'*' * (level + 2)} Form {i}: Action={form['action']}, Method={form['method']}")
+                for inp in form["inputs"]:
+                    if (inp.get("type") or "").lower() != "hidden":
+                        lines.append(f"{'*' * (level + 3)} Input: name={inp['name']}, type={inp['type']}, "
+                                     f"placeholder={inp['placeholder']}")
+                if form["buttons"]:
+                    under = level + 3 + bool(form["inputs"])  # below the inputs, as in prompt.txt
+                    lines.append(f"{'*' * under} Buttons: {', '.join(form['buttons'])}")
+            stack.extend((c, level + 1) for c in reversed(children.get(url, [])))
+        lines.append("@endmindmap")
+        return "\n".join(lines)
+
+
+class OpenAIClient:
+    """Chat Completions client (`pip install openai`, key from OPENAI_API_KEY)."""
+
+    def __init__(self, model: str = "gpt-4o-mini", temperature: float = 0.0, **client_options):
+        from openai import OpenAI
+
+        self.model = model
+        self.temperature = temperature
+        self._client = OpenAI(**client_options)
+
+    def complete(self, instructions: str, batch_json: str) -> str:
+        resp = self._client.chat.completions.create(
+            model=self.model, temperature=self.temperature,
+            messages=[{"role": "system", "content": instructions},
+                      {"role": "user", "content": batch_json}])
+        return resp.choices[0].message.content or ""
+
+
+CLIENTS = {"mock": MockLLMClient, "openai": OpenAIClient}
+
+
+class AnswerCache:
+    """LLM answers on disk, addressed by `Batch.key`."""
+
+    def __init__(self, cache_dir: str = ".llm_cache"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.puml")
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+# ---------- stitching ----------
+def mindmap_lines(answer: str):
+    """`(stars, rest)` of the node lines of an answer, without its root node."""
+    start = answer.find("@startmindmap")
+    end = answer.find("@endmindmap", start + 1)
+    body = answer[start + len("@startmindmap"):end if end != -1 else None] if start != -1 else answer
+    nodes = []
+    for line in body.splitlines():
+        m = _STARS.match(line.strip())
+        if m and len(m.group(1)) > 1:
+            nodes.append((len(m.group(1)), m.group(2)))
+    return nodes
+
+
+def split_answer(answer: str, parts: int):
+    """
+    An answer for `parts` subtrees sent together, cut at its top-level nodes into one
+    answer per subtree, or None if it does not have exactly `parts` top-level nodes.
+    """
+    nodes = mindmap_lines(answer)
+    if not nodes:
+        return None
+    top = min(stars for stars, _ in nodes)
+    pieces = []
+    for stars, rest in nodes:
+        if stars == top:
+            pieces.append([])
+        elif not pieces:
+            return None
+        pieces[-1].append("*" * stars + rest)
+    if len(pieces) != parts:
+        return None
+    return ["\n".join(["@startmindmap", "* Site Mind Map", *lines, "@endmindmap"]) for lines in pieces]
+
+
+def stitch(answers, subtrees, root_name: str = "Website") -> str:
+    """One @startmindmap document; subtree i's top nodes land at its depth + 1 stars."""
+    lines = ["@startmindmap", f"* {root_name}"]
+    prev = 1
+    for answer, subtree in zip(answers, subtrees):
+        nodes = mindmap_lines(answer)
+        if not nodes:
+            log.warning("[llm] empty answer for a subtree of %s pages", len(subtree.pages))
+            continue
+        shift = subtree.depth + 1 - min(stars for stars, _ in nodes)
+        for stars, rest in nodes:
+            stars = min(stars + shift, prev + 1)  # a node can only go one level deeper
+            lines.append("*" * stars + rest)
+            prev = stars
+    lines.append("@endmindmap")
+    return "\n".join(lines)
+
+
+def generate(graph, client, instructions: str, cache: AnswerCache = None, max_chars: int = MAX_BATCH_CHARS,
+             max_workers: int = 4, root_name: str = "Website") -> str:
+    """
+    Split into subtrees, look each up in `cache`, send the misses packed into requests
+    (`max_workers` at a time) and stitch. Returns the PlantUML text.
+    """
+    subtrees = split_subtrees(graph, max_chars)
+    model = getattr(client, "model", type(client).__name__)
+    keys = [subtree.key(model, instructions) for subtree in subtrees]
+    answers = [cache.get(key) if cache is not None else None for key in keys]
+    missing = [i for i, a in enumerate(answers) if a is None]
+    requests = [[missing[j] for j in request] for request in pack_requests([subtrees[i] for i in missing], max_chars)]
+    fallback = MockLLMClient()
+    sent, fell_back, resent = [], [], []  # appended from the worker threads
+
+    def ask(indices):
+        """Answers for the subtrees `indices`, sent as one request."""
+        pages = {}
+        for i in indices:
+            pages.update(subtrees[i].pages)
+        text = json.dumps(pages, indent=1, ensure_ascii=False)
+        sent.append(indices)
+        try:
+            answer = client.complete(instructions, text)
+        except Exception as e:
+            log.error("[llm] request for %s pages failed (%s); using the plain layout", len(pages), e)
+            answer = None
+        if answer is not None and not mindmap_lines(answer):
+            log.warning("[llm] no mind map in the answer for %s; using the plain layout", next(iter(pages)))
+            answer = None
+        if answer is None:
+            fell_back.append(indices)
+            return [fallback.complete(instructions, subtrees[i].text) for i in indices]
+        parts = [answer] if len(indices) == 1 else split_answer(answer, len(indices))
+        if parts is None:
+            # the subtrees cannot be told apart in the answer: ask for each on its own
+            log.info("[llm] answer for %s subtrees does not split per subtree; sending them one by one",
+                     len(indices))
+            resent.append(indices)
+            return [ask([i])[0] for i in indices]
+        if cache is not None:
+            for i, part in zip(indices, parts):
+                cache.put(keys[i], part)
+        return parts
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(requests) or 1))) as pool:
+        for indices, parts in zip(requests, pool.map(ask, requests)):
+            for i, part in zip(indices, parts):
+                answers[i] = part
+    log.info("[llm] %s pages in %s subtrees, %s from cache: %s requests to %s "
+             "(%s split again, %s fell back to the plain layout)",
+             len(graph), len(subtrees), len(subtrees) - len(missing), len(sent), type(client).__name__,
+             len(resent), len(fell_back))
+    return stitch(answers, subtrees, root_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched LLM mind map of a crawl")
+    parser.add_argument("input", help="Crawler .json/.jsonl output or a saved site graph")
+    parser.add_argument("--out", default="mindmap_llm.puml", help="PlantUML output file")
+    parser.add_argument("--svg", default=None, help="Also render the mind map (MindMap_Maker.generate_mindmap)")
+    parser.add_argument("--client", choices=sorted(CLIENTS), default="mock", help="LLM client")
+    parser.add_argument("--model", default="gpt-4o-mini", help="Model for --client openai")
+    parser.add_argument("--prompt", default="prompt.txt", help="Instructions sent with every request")
+    parser.add_argument("--max-chars", type=int, default=MAX_BATCH_CHARS, help="JSON characters per request")
+    parser.add_argument("--workers", type=int, default=4, help="Requests sent in parallel")
+    parser.add_argument("--cache-dir", default=".llm_cache", help="Answer cache ('' to disable)")
+    parser.add_argument("--root-name", default="Website", help="Root node of the mind map")
+    args = parser.parse_args()
+    configure_logging()
+
+    with open(args.prompt, "r", encoding="utf-8") as f:
+        instructions = f.read()
+    client = OpenAIClient(args.model) if args.client == "openai" else MockLLMClient()
+    cache = AnswerCache(args.cache_dir) if args.cache_dir else None
+    uml = generate(load_graph(args.input), client, instructions, cache=cache, max_chars=args.max_chars,
+                   max_workers=args.workers, root_name=args.root_name)
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(uml)
+    log.info("[ok] PlantUML mind map saved to %s", args.out)
+    if args.svg:
+        from MindMap_Maker import generate_mindmap
+
+        generate_mindmap(uml, args.svg)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Mind-map emitters over a `SiteGraph` (see site_graph.py).
+
+- PlantUML  @startmindmap text (the Crawl_site_playwright layout)
+- Markmap   nested Markdown list
+- FreeMind  .mm XML, the format of the hand-made Team_Venture.mm
+- XMind     .xmind zip (content.json, the XMind 2020+ format)
+
+All of them walk the crawl tree (pages nested under their crawl parent) with
+`SiteGraph.walk`, so `max_depth` and `forms` mean the same thing everywhere:
+`max_depth` caps the page levels shown ("… N more pages" stands in for the rest)
+and `forms` is "full", "summary" or "none". With `shared` (the default), forms
+repeated across pages are emitted once under a "Shared components" branch and
+pages reference them (see shared_components.py). These layouts do not draw links,
+so link sets are not factored. Markdown and FreeMind are written one page at a time.
+
+    python mindmap_export.py site_structure.json Team_Venture.mm --root-name "Teamup Ventures"
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import zipfile
+from urllib.parse import urlparse, urlsplit
+from xml.sax.saxutils import quoteattr
+
+from crawl_metrics import configure_logging
+from shared_components import SHARED_BRANCH, SharedComponents
+from site_graph import load_graph
+
+log = logging.getLogger(__name__)
+
+FORM_MODES = ("full", "summary", "none")
+
+
+# ---------- shared node texts ----------
+def node_path(url: str) -> str:
+    # urlsplit skips urlparse's ;params handling, which only matters if the path has one
+    path = urlsplit(url).path
+    if ";" in path:
+        path = urlparse(url).path
+    return path or "/"
+
+
+def _one_line(text: str) -> str:
+    return " ".join(str(text).split())
+
+
+def form_texts(form: dict, mode: str = "full"):
+    """`(depth, text)` nodes for one form; depth 0 is the form itself."""
+    if mode == "none":
+        return []
+    head = f"Form: {form['method']} {form['action'] or ''}"
+    if mode == "summary":
+        return [(0, f"{head} ({len(form['inputs'])} fields, {len(form['buttons'])} buttons)")]
+    nodes = [(0, head)]
+    for inp in form["inputs"]:
+        inp_name = inp["name"] or inp.get("placeholder") or "unnamed"
+        nodes.append((1, f"Field: {inp_name} ({inp['type']})"))
+    for btn in form["buttons"]:
+        nodes.append((1, f"Button: {btn}"))
+    return nodes
+
+
+def page_texts(graph, uid: int, hidden: int = 0, forms: str = "full", shared: SharedComponents = None):
+    """
+    `(depth, text)` nodes shown under a page: headings, forms (or one reference line
+    to the shared components it uses), the cut-off marker.
+    """
+    rec = graph.record(uid)
+    nodes, prev = [], -1
+    for level, text in rec.headings:
+        prev = min(level - 1, 2, prev + 1)  # never skip a level
+        nodes.append((prev, _one_line(text)))
+    page_forms = rec.forms if forms != "none" else ()
+    if shared:
+        labels, unshared = shared.page_refs(page_forms, ())  # links are not drawn
+        if labels:
+            shared.references += 1
+            shared.replaced_lines += sum(len(form_texts(f, forms)) for f in page_forms if f not in unshared)
+        page_forms = unshared
+    for form in page_forms:
+        nodes.extend(form_texts(form, forms))
+    if shared and labels:
+        nodes.append((0, "Uses: " + ", ".join(labels)))
+    if hidden:
+        nodes.append((0, f"… {hidden} more pages"))
+    return nodes
+
+
+def detect_shared(graph, forms: str = "full", **options) -> SharedComponents:
+    """Shared forms of the crawled pages (see SharedComponents.detect); links are not drawn, so not factored."""
+    pages = ((graph.urls[uid], graph.record(uid).forms if forms != "none" else (), ())
+             for uid in graph.crawled_ids())
+    return SharedComponents.detect(pages, **options)
+
+
+def shared_texts(shared: SharedComponents, forms: str = "full"):
+    """The "Shared components" branch as `(depth, text)` nodes, depth 0 = the branch."""
+    if not shared:
+        return []
+    return [(0, SHARED_BRANCH)] + [(depth + 1, text) for depth, text in shared.texts(form_texts, forms)]
+
+
+def _check_forms(forms: str):
+    if forms not in FORM_MODES:
+        raise ValueError(f"forms must be one of {FORM_MODES}")
+
+
+# ---------- PlantUML ----------
+def graph_to_plantuml(graph, root_name: str = "Website", max_depth: int = None, forms: str = "full",
+                      shared: bool = True) -> str:
+    _check_forms(forms)
+    components = detect_shared(graph, forms) if shared else None
+    lines = ["@startmindmap", f"* {root_name}"]
+    branch = shared_texts(components, forms)
+    lines.extend(f"{'*' * (depth + 2)} {text}" for depth, text in branch)
+    for depth, uid, hidden in graph.walk(max_depth):
+        prefix = "*" * (depth + 1)
+        url = graph.urls[uid]
+        lines.append(f"{prefix} {graph.record(uid).title or url} ({node_path(url)})")
+        for sub, text in page_texts(graph, uid, hidden, forms, components):
+            lines.append(f"{prefix}{'*' * (sub + 1)} {text}")
+    lines.append("@endmindmap")
+    if components:
+        log.info(components.report(len(lines), len(branch)))
+    return "\n".join(lines)
+
+
+# ---------- Markmap ----------
+def graph_to_markdown(graph, out_file: str = "structure.md", root_name: str = "Site Structure",
+                      max_depth: int = None, forms: str = "full", shared: bool = True):
+    _check_forms(forms)
+    components = detect_shared(graph, forms) if shared else None
+    with open(out_file, "w", encoding="utf-8") as f:
+        f.write(f"# {root_name}\n")
+        for depth, text in shared_texts(components, forms):
+            f.write(f"{'  ' * depth}- {text}\n")
+        for depth, uid, hidden in graph.walk(max_depth):
+            indent = "  " * (depth - 1)
+            url = graph.urls[uid]
+            title = _one_line(graph.record(uid).title or url)
+            f.write(f"{indent}- [{title}]({url})\n")
+            for sub, text in page_texts(graph, uid, hidden, forms, components):
+                f.write(f"{indent}{'  ' * (sub + 1)}- {text}\n")
+    log.info("[ok] saved markdown to %s", out_file)
+
+
+# ---------- FreeMind ----------
+def _write_mm_nodes(f, pad: str, nodes):
+    """Nested `(depth, text)` nodes; leaves are self-closing."""
+    open_nodes = []
+    for i, (sub, text) in enumerate(nodes):
+        while open_nodes and open_nodes[-1] >= sub:
+            f.write(pad + "  " * (open_nodes.pop() + 1) + "</node>\n")
+        if i + 1 < len(nodes) and nodes[i + 1][0] > sub:
+            f.write(f"{pad}{'  ' * (sub + 1)}<node TEXT={quoteattr(text)}>\n")
+            open_nodes.append(sub)
+        else:
+            f.write(f"{pad}{'  ' * (sub + 1)}<node TEXT={quoteattr(text)}/>\n")
+    while open_nodes:
+        f.write(pad + "  " * (open_nodes.pop() + 1) + "</node>\n")
+
+
+def graph_to_freemind(graph, out_file: str = "mindmap.mm", root_name: str = "Website",
+                      max_depth: int = None, forms: str = "full", shared: bool = True):
+    _check_forms(forms)
+    components = detect_shared(graph, forms) if shared else None
+    tmp = out_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write('<map version="1.0.1">\n')
+        f.write(f"  <node TEXT={quoteattr(root_name)}>\n")
+        _write_mm_nodes(f, "  ", shared_texts(components, forms))
+        open_depth = 0
+        for depth, uid, hidden in graph.walk(max_depth):
+            while open_depth >= depth:
+                f.write("  " * (open_depth + 1) + "</node>\n")
+                open_depth -= 1
+            url = graph.urls[uid]
+            title = _one_line(graph.record(uid).title or url)
+            pad = "  " * (depth + 1)
+            f.write(f"{pad}<node TEXT={quoteattr(title)} LINK={quoteattr(url)}>\n")
+            _write_mm_nodes(f, pad, page_texts(graph, uid, hidden, forms, components))
+            open_depth = depth
+        while open_depth >= 0:
+            f.write("  " * (open_depth + 1) + "</node>\n")
+            open_depth -= 1
+        f.write("</map>\n")
+    os.replace(tmp, out_file)
+    log.info("[ok] saved FreeMind map to %s", out_file)
+
+
+# ---------- XMind ----------
+def graph_to_xmind(graph, out_file: str = "mindmap.xmind", root_name: str = "Website",
+                   max_depth: int = None, forms: str = "full", shared: bool = True):
+    _check_forms(forms)
+    components = detect_shared(graph, forms) if shared else None
+    ids = itertools.count(1)
+
+    def topic(title, href=None):
+        t = {"id": f"topic-{next(ids)}", "class": "topic", "title": title}
+        if href:
+            t["href"] = href
+        return t
+
+    def attach(parent, child):
+        parent.setdefault("children", {"attached": []})["attached"].append(child)
+
+    def attach_texts(parent, nodes):
+        subs = [parent]
+        for sub, text in nodes:
+            del subs[sub + 1:]
+            node = topic(text)
+            attach(subs[-1], node)
+            subs.append(node)
+
+    root = topic(root_name)
+    root["structureClass"] = "org.xmind.ui.logic.right"
+    attach_texts(root, shared_texts(components, forms))
+    stack = [root]  # stack[d] is the open topic at page depth d
+    for depth, uid, hidden in graph.walk(max_depth):
+        del stack[depth:]
+        url = graph.urls[uid]
+        page = topic(_one_line(graph.record(uid).title or url), url)
+        attach(stack[-1], page)
+        stack.append(page)
+        attach_texts(page, page_texts(graph, uid, hidden, forms, components))
+
+    content = [{"id": "sheet-1", "class": "sheet", "title": root_name, "rootTopic": root}]
+    tmp = out_file + ".tmp"
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("content.json", json.dumps(content, ensure_ascii=False))
+        z.writestr("metadata.json", json.dumps({"creator": {"name": "mind-maps"}}))
+        z.writestr("manifest.json", json.dumps({"file-entries": {"content.json": {}, "metadata.json": {}}}))
+    os.replace(tmp, out_file)
+    log.info("[ok] saved XMind map to %s", out_file)
+
+
+def _write_plantuml(graph, out_file, **options):
+    with open(out_file, "w", encoding="utf-8") as f:
+        f.write(graph_to_plantuml(graph, **options))
+    log.info("[ok] PlantUML mind map saved to %s", out_file)
+
+
+EMITTERS = {
+    ".puml": _write_plantuml,
+    ".md": graph_to_markdown,
+    ".mm": graph_to_freemind,
+    ".xmind": graph_to_xmind,
+}
+
+
+def export_graph(graph, out_file: str, **options):
+    """Write `graph` in the format given by `out_file`'s extension (see EMITTERS)."""
+    ext = os.path.splitext(out_file)[1].lower()
+    if ext not in EMITTERS:
+        raise ValueError(f"unknown mind map format {ext!r}; choose from {sorted(EMITTERS)}")
+    EMITTERS[ext](graph, out_file, **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a crawl or saved site graph into mind maps")
+    parser.add_argument("input", help="Site graph (--graph-out) or crawler .json/.jsonl output")
+    parser.add_argument("outputs", nargs="+", help=f"Output files; format from extension {sorted(EMITTERS)}")
+    parser.add_argument("--root-name", default="Website", help="Root node of the mind map")
+    parser.add_argument("--max-depth", type=int, default=None,
+                        help="Page levels shown; deeper pages are summarized")
+    parser.add_argument("--forms", choices=FORM_MODES, default="full",
+                        help="Show forms in full, as one summary line each, or not at all")
+    parser.add_argument("--no-shared", action="store_true",
+                        help="Repeat shared forms on every page instead of a 'Shared components' branch")
+    args = parser.parse_args()
+    configure_logging()
+
+    graph = load_graph(args.input)
+    for out_file in args.outputs:
+        export_graph(graph, out_file, root_name=args.root_name, max_depth=args.max_depth, forms=args.forms,
+                     shared=not args.no_shared)
+
+
+if __name__ == "__main__":
+    main()
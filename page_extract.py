@@ -0,0 +1,233 @@
+"""
+Single-pass page extraction: title, headings (document order), raw link hrefs and
+the `<link rel=canonical>` href from one walk over the document.
+
+Backends (fastest first; "auto" picks the first one installed):
+- "selectolax"  selectolax's lexbor parser (C)
+- "lxml"        lxml.html (C)
+- "html.parser" streaming stdlib parser, no tree is built (always available)
+- "bs4"         BeautifulSoup + html.parser, for parity with the old code
+
+`extract_forms` reads forms from static HTML the way Crawl_site_playwright's
+EXTRACT_JS reads them from the DOM.
+"""
+
+from functools import lru_cache
+from html.parser import HTMLParser
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+_SELECTOR = "title, h1, h2, h3, h4, h5, h6, a[href], link[rel]"
+
+
+def _is_canonical(rel) -> bool:
+    return rel is not None and "canonical" in rel.lower().split()
+
+
+def _extract_selectolax(html: str) -> dict:
+    from selectolax.lexbor import LexborHTMLParser
+
+    page = {"title": None, "headings": [], "links": [], "canonical": None}
+    for node in LexborHTMLParser(html).css(_SELECTOR):
+        tag = node.tag
+        if tag == "a":
+            href = node.attributes.get("href")
+            if href is not None:
+                page["links"].append(href)
+        elif tag == "link":
+            if page["canonical"] is None and _is_canonical(node.attributes.get("rel")):
+                page["canonical"] = node.attributes.get("href")
+        elif tag == "title":
+            if page["title"] is None:
+                page["title"] = node.text(strip=True)
+        else:
+            text = node.text(separator=" ", strip=True)
+            if text:
+                page["headings"].append((int(tag[1]), text))
+    return page
+
+
+def _extract_lxml(html: str) -> dict:
+    import lxml.html
+
+    page = {"title": None, "headings": [], "links": [], "canonical": None}
+    if not html.strip():
+        return page
+    root = lxml.html.fromstring(html.encode("utf-8"), parser=lxml.html.HTMLParser(encoding="utf-8"))
+    for el in root.iter("title", "a", "link", *HEADING_TAGS):
+        tag = el.tag
+        if tag == "a":
+            href = el.get("href")
+            if href is not None:
+                page["links"].append(href)
+            continue
+        if tag == "link":
+            if page["canonical"] is None and _is_canonical(el.get("rel")):
+                page["canonical"] = el.get("href")
+            continue
+        parts = [s.strip() for s in el.itertext() if s.strip()]
+        if tag == "title":
+            if page["title"] is None:
+                page["title"] = "".join(parts)
+        elif parts:
+            page["headings"].append((int(tag[1]), " ".join(parts)))
+    return page
+
+
+class _StreamingExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.page = {"title": None, "headings": [], "links": [], "canonical": None}
+        self._title = None      # text parts while inside <title>
+        self._heading = None    # (level, text parts) while inside <hN>
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href" and value is not None:
+                    self.page["links"].append(value)
+                    break
+        elif tag == "link":
+            attrs = dict(attrs)
+            if self.page["canonical"] is None and _is_canonical(attrs.get("rel")):
+                self.page["canonical"] = attrs.get("href")
+        elif tag in HEADING_TAGS and self._heading is None:
+            self._heading = (int(tag[1]), [])
+        elif tag == "title" and self.page["title"] is None:
+            self._title = []
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self._title is not None:
+            self.page["title"] = "".join(s.strip() for s in self._title)
+            self._title = None
+        elif self._heading is not None and tag == f"h{self._heading[0]}":
+            level, parts = self._heading
+            text = " ".join(s.strip() for s in parts if s.strip())
+            if text:
+                self.page["headings"].append((level, text))
+            self._heading = None
+
+    def handle_data(self, data):
+        if self._title is not None:
+            self._title.append(data)
+        if self._heading is not None:
+            self._heading[1].append(data)
+
+
+class _FormExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms = []
+        self._form = None
+        self._button = None  # text parts while inside <button>
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form":
+            self._form = {"action": attrs.get("action"), "method": attrs.get("method") or "GET",
+                          "inputs": [], "buttons": []}
+            self.forms.append(self._form)
+        elif self._form is None:
+            return
+        elif tag in ("input", "textarea", "select"):
+            itype = attrs.get("type") or "text"
+            if itype.lower() != "hidden":
+                self._form["inputs"].append({"name": attrs.get("name"), "type": itype,
+                                             "placeholder": attrs.get("placeholder")})
+            if tag == "input" and itype.lower() == "submit" and attrs.get("value"):
+                self._form["buttons"].append(attrs["value"])
+        elif tag == "button":
+            self._button = ([], attrs.get("value"))
+
+    def handle_endtag(self, tag):
+        if tag == "button" and self._button is not None:
+            parts, value = self._button
+            text = " ".join(s.strip() for s in parts if s.strip())
+            if text or value:
+                self._form["buttons"].append(text or value)
+            self._button = None
+        elif tag == "form":
+            self._form = None
+
+    def handle_data(self, data):
+        if self._button is not None:
+            self._button[0].append(data)
+
+
+def extract_forms(html: str) -> list:
+    """
+    [{"action", "method", "inputs": [{"name", "type", "placeholder"}], "buttons": [text]}]
+    in document order; hidden inputs are left out. Same schema as the Playwright crawler.
+    """
+    parser = _FormExtractor()
+    parser.feed(html)
+    parser.close()
+    return parser.forms
+
+
+def _extract_stdlib(html: str) -> dict:
+    parser = _StreamingExtractor()
+    parser.feed(html)
+    parser.close()
+    return parser.page
+
+
+def _extract_bs4(html: str) -> dict:
+    from bs4 import BeautifulSoup
+
+    page = {"title": None, "headings": [], "links": [], "canonical": None}
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup.find_all(["title", "a", "link", *HEADING_TAGS]):
+        if tag.name == "a":
+            if tag.get("href") is not None:
+                page["links"].append(tag.get("href"))
+        elif tag.name == "link":
+            # bs4 splits rel into a list
+            if page["canonical"] is None and _is_canonical(" ".join(tag.get("rel") or [])):
+                page["canonical"] = tag.get("href")
+        elif tag.name == "title":
+            if page["title"] is None:
+                page["title"] = tag.get_text(strip=True)
+        else:
+            text = tag.get_text(separator=" ", strip=True)
+            if text:
+                page["headings"].append((int(tag.name[1]), text))
+    return page
+
+
+BACKENDS = {
+    "selectolax": _extract_selectolax,
+    "lxml": _extract_lxml,
+    "html.parser": _extract_stdlib,
+    "bs4": _extract_bs4,
+}
+
+
+@lru_cache(maxsize=None)
+def available_backends():
+    names = []
+    for name, module in (("selectolax", "selectolax.lexbor"), ("lxml", "lxml.html"), ("bs4", "bs4")):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        names.append(name)
+    names.insert(len(names) - ("bs4" in names), "html.parser")
+    return tuple(names)
+
+
+def get_backend(name: str = "auto"):
+    """Extraction function for `name`; "auto" picks the fastest installed backend."""
+    if name in (None, "auto"):
+        name = available_backends()[0]
+    if name not in BACKENDS:
+        raise ValueError(f"unknown parser backend {name!r}; choose from {sorted(BACKENDS)}")
+    return BACKENDS[name]
+
+
+def extract_page(html: str, backend: str = "auto") -> dict:
+    """
+    Returns {"title": str or None, "headings": [(level, text)], "links": [raw href],
+    "canonical": raw href of <link rel=canonical> or None}. Headings and links are in
+    document order.
+    """
+    return get_backend(backend)(html)
@@ -0,0 +1,124 @@
+"""
+Multi-process page parsing, decoupled from fetching.
+
+Fetch workers hand raw response bytes to `ParsePool.parse`. The bytes wait in a
+bounded asyncio queue, so a fetcher blocks once `queue_size` pages are waiting
+and raw pages in memory stay bounded. `workers` dispatcher tasks feed the queue to a
+ProcessPoolExecutor of as many processes, so CPU-bound parsing (headings, the
+link loop, the near-duplicate fingerprint) runs outside the crawler's process and
+its GIL. `workers=0` parses in the calling process, as before.
+
+`InOrder` lets the crawler apply parsed pages in the order they were handed
+over, whatever order the processes finish in.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# set in each worker process by _init_worker
+_parse = None
+_fingerprint = None
+
+
+def _init_worker(parse, fingerprint):
+    global _parse, _fingerprint
+    _parse, _fingerprint = parse, fingerprint
+
+
+def parse_body(parse, fingerprint, body: bytes, encoding: str, url: str):
+    """`(record, fingerprint or None, seconds)` for one page."""
+    t0 = time.perf_counter()
+    html = body.decode(encoding or "utf-8", errors="replace")
+    record = parse(html, url)
+    return record, fingerprint(html) if fingerprint else None, time.perf_counter() - t0
+
+
+def _run(body: bytes, encoding: str, url: str):
+    return parse_body(_parse, _fingerprint, body, encoding, url)
+
+
+class ParsePool:
+    """
+    `parse(html, url)` and `fingerprint(html)` must be picklable (module-level
+    functions or functools.partial of them); they run in the worker processes.
+    Use as an async context manager.
+    """
+
+    def __init__(self, parse, fingerprint=None, workers: int = 2, queue_size: int = None):
+        self.parse_fn = parse
+        self.fingerprint_fn = fingerprint
+        self.workers = max(0, workers)
+        self.queue_size = queue_size or 2 * max(1, self.workers)
+        self._executor = None
+        self._queue = None
+        self._dispatchers = []
+
+    async def __aenter__(self):
+        if self.workers:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self.parse_fn, self.fingerprint_fn))
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        return self
+
+    async def __aexit__(self, *exc):
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            body, encoding, url, future = await self._queue.get()
+            try:
+                result = await loop.run_in_executor(self._executor, _run, body, encoding, url)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def parse(self, body: bytes, encoding: str, url: str):
+        """`(record, fingerprint or None, parse seconds)`; waits while the queue is full."""
+        if not self.workers:
+            return parse_body(self.parse_fn, self.fingerprint_fn, body, encoding, url)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((body, encoding, url, future))
+        return await future
+
+
+class InOrder:
+    """
+    Tickets 0, 1, 2, ... handed out with `ticket()`; `wait(t)` returns once every
+    earlier ticket has been released. `release` never blocks, so a holder that
+    gives up (an error, a duplicate page) just releases its ticket.
+    """
+
+    def __init__(self):
+        self._issued = 0
+        self._next = 0
+        self._released = set()
+        self._turns = {}  # ticket -> Event, for tickets waiting their turn
+
+    def ticket(self) -> int:
+        self._issued += 1
+        return self._issued - 1
+
+    async def wait(self, ticket: int):
+        if ticket != self._next:
+            await self._turns.setdefault(ticket, asyncio.Event()).wait()
+
+    def release(self, ticket: int):
+        self._released.add(ticket)
+        while self._next in self._released:
+            self._released.discard(self._next)
+            self._next += 1
+        turn = self._turns.pop(self._next, None)
+        if turn is not None:
+            turn.set()
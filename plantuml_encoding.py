@@ -0,0 +1,36 @@
+"""
+PlantUML text encoding (deflate + PlantUML's base64 variant), shared by all scripts.
+
+PlantUML's alphabet is `0-9A-Za-z-_` instead of base64's `A-Za-z0-9+/`, so the
+encoder is the C-implemented `base64.b64encode` followed by one `bytes.translate`.
+Padding `=` maps to `0`, which is what the reference encoder emits for a short
+final group (it pads the missing bytes with zeros).
+"""
+
+import base64
+import zlib
+
+_B64 = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+_PUML = b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz-_"
+
+_ENCODE = bytes.maketrans(_B64 + b"=", _PUML + b"0")
+_DECODE = bytes.maketrans(_PUML, _B64)
+
+
+def encode64(data: bytes) -> str:
+    return base64.b64encode(data).translate(_ENCODE).decode("ascii")
+
+
+def decode64(encoded: str) -> bytes:
+    """Inverse of `encode64`. Zero padding decodes to trailing zero bytes."""
+    return base64.b64decode(encoded.encode("ascii").translate(_DECODE))
+
+
+def plantuml_encode(text: str) -> str:
+    compressed = zlib.compress(text.encode("utf-8"))[2:-4]  # strip zlib headers
+    return encode64(compressed)
+
+
+def plantuml_decode(encoded: str) -> str:
+    # raw deflate stops at its end-of-stream marker, so padding bytes are ignored
+    return zlib.decompressobj(-zlib.MAX_WBITS).decompress(decode64(encoded)).decode("utf-8")
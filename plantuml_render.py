@@ -0,0 +1,228 @@
+"""
+Pluggable PlantUML renderers with a content-addressed render cache.
+
+Renderers turn an encoded diagram (see plantuml_encoding.py) into image bytes:
+- "server"  any PlantUML HTTP server, the public plantuml.com one by default
+- "local"   a `java -jar plantuml.jar -picoweb` process started once and kept warm,
+            so there is no internet round-trip and no public URL-length limit
+- "stub"    in-process stand-in that returns a minimal SVG of the node texts,
+            for tests and offline runs
+
+`render_diagrams` renders independent diagrams in parallel and keeps results in a
+`RenderCache` keyed by (format, encoded diagram), so unchanged chunks are never
+re-rendered. Given a crawl_metrics.CrawlMetrics it records the "encode" and
+"render" stages.
+"""
+
+import hashlib
+import os
+import socket
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+import requests
+
+from plantuml_encoding import plantuml_decode, plantuml_encode
+
+PUBLIC_SERVER = "http://www.plantuml.com/plantuml"
+
+
+class RenderError(Exception):
+    pass
+
+
+class Renderer(ABC):
+    name = "base"
+
+    @abstractmethod
+    def render(self, encoded: str, fmt: str = "svg") -> bytes:
+        ...
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ServerRenderer(Renderer):
+    name = "server"
+
+    def __init__(self, base_url: str = PUBLIC_SERVER, session=None, timeout: float = 30, headers=None):
+        self.base_url = base_url.rstrip("/")
+        self.session = session or requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        self.timeout = timeout
+
+    def url(self, encoded: str, fmt: str = "svg") -> str:
+        return f"{self.base_url}/{fmt}/{encoded}"
+
+    def render(self, encoded: str, fmt: str = "svg") -> bytes:
+        resp = self.session.get(self.url(encoded, fmt), timeout=self.timeout)
+        if resp.status_code != 200:
+            raise RenderError(f"PlantUML server returned {resp.status_code}: {resp.text[:200]}")
+        return resp.content
+
+    def close(self):
+        self.session.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalServerRenderer(ServerRenderer):
+    """Runs PlantUML's built-in web server from `jar` on localhost for the renderer's lifetime."""
+
+    name = "local"
+
+    def __init__(self, jar: str = "plantuml.jar", java: str = "java", port: int = None,
+                 startup_timeout: float = 30, timeout: float = 60):
+        if not os.path.exists(jar):
+            raise RenderError(f"PlantUML jar not found: {jar}")
+        self.port = port or _free_port()
+        self.process = subprocess.Popen(
+            [java, "-Djava.awt.headless=true", "-jar", jar, f"-picoweb:{self.port}:127.0.0.1"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        super().__init__(f"http://127.0.0.1:{self.port}/plantuml", timeout=timeout)
+        self._wait_ready(startup_timeout)
+
+    def _wait_ready(self, startup_timeout: float):
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RenderError(f"PlantUML server exited with code {self.process.returncode}")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.close()
+        raise RenderError(f"PlantUML server did not start within {startup_timeout}s")
+
+    def close(self):
+        super().close()
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class StubRenderer(Renderer):
+    """Decodes the diagram and draws one SVG text line per node. No Java, no network."""
+
+    name = "stub"
+
+    def __init__(self):
+        self.renders = 0
+
+    def render(self, encoded: str, fmt: str = "svg") -> bytes:
+        if fmt != "svg":
+            raise RenderError("stub renderer only produces svg")
+        self.renders += 1
+        lines = [l for l in plantuml_decode(encoded).splitlines() if l.strip() and not l.startswith("@")]
+        texts = "".join(
+            f'<text x="{10 + 12 * (len(l) - len(l.lstrip("*")))}" y="{20 * (i + 1)}">{escape(l.lstrip("* "))}</text>'
+            for i, l in enumerate(lines)
+        )
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" width="800" height="{20 * (len(lines) + 1)}">'
+                f"{texts}</svg>").encode("utf-8")
+
+
+RENDERERS = {"server": ServerRenderer, "local": LocalServerRenderer, "stub": StubRenderer}
+
+
+def get_renderer(name: str = "server", **options) -> Renderer:
+    if name not in RENDERERS:
+        raise ValueError(f"unknown renderer {name!r}; choose from {sorted(RENDERERS)}")
+    return RENDERERS[name](**options)
+
+
+class RenderCache:
+    """Rendered images on disk, addressed by sha256(format + encoded diagram)."""
+
+    def __init__(self, cache_dir: str = ".render_cache"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, encoded: str, fmt: str) -> str:
+        key = hashlib.sha256(f"{fmt}:{encoded}".encode("ascii")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{fmt}")
+
+    def get(self, encoded: str, fmt: str = "svg"):
+        try:
+            with open(self._path(encoded, fmt), "rb") as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, encoded: str, data: bytes, fmt: str = "svg"):
+        path = self._path(encoded, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def render_diagrams(diagrams, renderer: Renderer, cache: RenderCache = None, fmt: str = "svg",
+                    max_workers: int = 4, metrics=None):
+    """
+    Render PlantUML texts in parallel. Returns one entry per diagram, in order:
+    image bytes, or the RenderError/exception raised for it. Identical diagrams
+    are rendered once.
+    """
+    encoded = []
+    for text in diagrams:
+        t0 = time.perf_counter()
+        encoded.append(plantuml_encode(text))
+        if metrics is not None:
+            metrics.observe("encode", time.perf_counter() - t0)
+
+    def render_one(enc):
+        if cache is not None:
+            data = cache.get(enc, fmt)
+            if data is not None:
+                if metrics is not None:
+                    metrics.incr("render_cache_hits")
+                return data
+        t0 = time.perf_counter()
+        try:
+            data = renderer.render(enc, fmt)
+        finally:
+            if metrics is not None:
+                metrics.observe("render", time.perf_counter() - t0)
+        if cache is not None:
+            cache.put(enc, data, fmt)
+        return data
+
+    unique = list(dict.fromkeys(encoded))
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique) or 1))) as pool:
+        futures = {enc: pool.submit(render_one, enc) for enc in unique}
+        for enc, future in futures.items():
+            try:
+                results[enc] = future.result()
+            except Exception as e:
+                results[enc] = e
+    return [results[enc] for enc in encoded]
@@ -0,0 +1,121 @@
+"""
+robots.txt policy cache, keyed by origin (scheme://host[:port]).
+
+Each origin's robots.txt is fetched once and reused until it expires (`ttl`), so a
+crawled page costs one HTTP request instead of two.
+
+Fetch policy:
+- 2xx            -> parse the rules
+- 401 / 403      -> disallow everything (same as urllib.robotparser)
+- other 4xx      -> allow everything (no robots.txt)
+- 5xx / network  -> `unreachable` policy ("allow" or "disallow"), cached only for
+                    `error_ttl` seconds so the file is retried soon
+"""
+
+import logging
+import threading
+import time
+import urllib.robotparser
+from urllib.parse import urlparse
+
+import requests
+
+log = logging.getLogger(__name__)
+
+
+class RobotsCache:
+    def __init__(self, session=None, user_agent: str = "*", ttl: float = 24 * 3600,
+                 error_ttl: float = 60, unreachable: str = "allow", timeout: float = 10):
+        if unreachable not in ("allow", "disallow"):
+            raise ValueError("unreachable must be 'allow' or 'disallow'")
+        self.session = session or requests.Session()
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.unreachable = unreachable
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._entries = {}  # origin -> (RobotFileParser, expires_at)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def origin(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def _origin_lock(self, origin: str) -> threading.Lock:
+        with self._lock:
+            lock = self._locks.get(origin)
+            if lock is None:
+                lock = self._locks[origin] = threading.Lock()
+            return lock
+
+    def _fetch(self, origin: str):
+        rp = urllib.robotparser.RobotFileParser(origin + "/robots.txt")
+        try:
+            resp = self.session.get(rp.url, timeout=self.timeout)
+        except Exception as e:
+            status, body = None, str(e)
+        else:
+            status, body = resp.status_code, resp.text
+
+        if status is not None and 200 <= status < 300:
+            rp.parse(body.splitlines())
+            return rp, self.ttl
+        if status in (401, 403):
+            rp.disallow_all = True
+            return rp, self.ttl
+        if status is not None and 400 <= status < 500:
+            rp.allow_all = True
+            return rp, self.ttl
+
+        self.errors += 1
+        log.warning("[robots.txt] %s unreachable (%s); policy=%s", rp.url, status or body, self.unreachable)
+        if self.unreachable == "allow":
+            rp.allow_all = True
+        else:
+            rp.disallow_all = True
+        return rp, self.error_ttl
+
+    def get(self, url: str) -> urllib.robotparser.RobotFileParser:
+        """Return the (cached) parsed robots.txt for `url`'s origin."""
+        origin = self.origin(url)
+        entry = self._entries.get(origin)
+        if entry and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+        with self._origin_lock(origin):
+            # another thread may have fetched it while we waited
+            entry = self._entries.get(origin)
+            if entry and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            rp, ttl = self._fetch(origin)
+            self._entries[origin] = (rp, time.monotonic() + ttl)
+            return rp
+
+    def can_fetch(self, url: str) -> bool:
+        return self.get(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str):
+        """`Crawl-delay` for our user-agent, or None."""
+        delay = self.get(url).crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+    def check(self, url: str):
+        """`(allowed, crawl_delay)` for `url` with a single cache lookup."""
+        rp = self.get(url)
+        delay = rp.crawl_delay(self.user_agent)
+        return rp.can_fetch(self.user_agent, url), float(delay) if delay is not None else None
+
+    def sitemaps(self, url: str) -> list:
+        """`Sitemap:` URLs listed in the robots.txt of `url`'s origin."""
+        return list(self.get(url).site_maps() or [])
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors,
+                "origins": len(self._entries)}
@@ -0,0 +1,146 @@
+"""
+Shared-template factoring for the mind-map converters.
+
+Most pages of a site repeat the same template parts: the search and login forms,
+the navigation menu, the footer links. `SharedComponents.detect` finds them:
+
+- forms are hashed by action, method, inputs and buttons (`include_action=False`
+  drops the action, for CMS templates that point it at the current page); a form on
+  at least `min_pages` pages becomes a component F1, F2, ...
+- links are grouped by the exact set of pages they appear on; a group of at least
+  `min_links` links shared by at least `min_pages` pages is a link set N1, N2, ...
+  (the menu, a section sidebar). Pages are tracked with a 64-bit xor signature per
+  link, so no per-link page lists are kept.
+
+Converters emit each component once under a "Shared components" branch and give
+each page one "Uses: F1, N1" reference line instead of repeating the parts. A
+converter that does not draw links passes no links, so it gets no link sets.
+"""
+
+import hashlib
+import json
+from urllib.parse import urlsplit
+
+SHARED_BRANCH = "Shared components"
+
+
+def _digest(data) -> str:
+    return hashlib.sha1(json.dumps(data, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+
+def form_key(form: dict, include_action: bool = True) -> str:
+    """Hash of a form's method, inputs and buttons, and its action unless `include_action` is False."""
+    data = [
+        (form.get("method") or "GET").upper(),
+        [(i.get("name"), i.get("type"), i.get("placeholder")) for i in form.get("inputs", [])],
+        list(form.get("buttons", [])),
+    ]
+    if include_action:
+        data.append(form.get("action"))
+    return _digest(data)
+
+
+def _page_bit(url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def link_label(url: str) -> str:
+    parts = urlsplit(url)
+    return (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+
+class SharedComponents:
+    def __init__(self, forms=None, link_sets=None, include_action: bool = True):
+        self.forms = forms or {}            # form key -> {"label", "form", "pages"}
+        self.link_sets = link_sets or []    # [{"label", "links", "pages"}]
+        self.include_action = include_action
+        self._link_owner = {l: s["label"] for s in self.link_sets for l in s["links"]}
+        # filled in by the converters, see `report`
+        self.references = 0
+        self.replaced_lines = 0
+
+    @classmethod
+    def detect(cls, pages, min_pages: int = 2, min_links: int = 3, include_action: bool = True):
+        """`pages` yields `(url, forms, links)`; one pass, nothing per page is kept."""
+        form_stats, link_stats = {}, {}
+        for url, forms, links in pages:
+            keys = [form_key(f, include_action) for f in forms]
+            for key, form in zip(keys, forms):
+                form_stats.setdefault(key, [0, form])
+            for key in set(keys):
+                form_stats[key][0] += 1
+            bit = _page_bit(url)
+            for link in set(links):
+                stat = link_stats.get(link)
+                if stat is None:
+                    link_stats[link] = [1, bit]
+                else:
+                    stat[0] += 1
+                    stat[1] ^= bit
+
+        forms = {}
+        for key, (count, form) in form_stats.items():
+            if count >= min_pages:
+                forms[key] = {"label": f"F{len(forms) + 1}", "form": form, "pages": count}
+
+        groups = {}
+        for link, (count, sig) in link_stats.items():
+            if count >= min_pages:
+                groups.setdefault((count, sig), []).append(link)
+        shared = sorted((links for links in groups.values() if len(links) >= min_links),
+                        key=lambda links: (-link_stats[links[0]][0], min(links)))
+        link_sets = [{"label": f"N{i}", "links": sorted(links), "pages": link_stats[links[0]][0]}
+                     for i, links in enumerate(shared, 1)]
+        return cls(forms, link_sets, include_action)
+
+    def __bool__(self) -> bool:
+        return bool(self.forms or self.link_sets)
+
+    def page_refs(self, forms, links):
+        """`(labels, unshared forms)` for one page."""
+        labels, unshared = [], []
+        for form in forms:
+            component = self.forms.get(form_key(form, self.include_action))
+            if component is None:
+                unshared.append(form)
+            elif component["label"] not in labels:
+                labels.append(component["label"])
+        seen = set()
+        for link in links:
+            label = self._link_owner.get(link)
+            if label and label not in seen:
+                seen.add(label)
+        labels.extend(s["label"] for s in self.link_sets if s["label"] in seen)
+        return labels, unshared
+
+    def texts(self, form_texts, form_mode: str = "full"):
+        """
+        `(depth, text)` nodes of the branch contents (depth 0 = one component).
+        `form_texts(form, mode)` renders a form the way the converter does.
+        """
+        nodes = []
+        if form_mode != "none":
+            for component in self.forms.values():
+                form = component["form"]
+                head = f"{component['label']}: Form {(form.get('method') or 'GET').upper()}"
+                if self.include_action and form.get("action"):
+                    head += f" {form['action']}"
+                if form_mode == "summary":
+                    head += f" ({len(form['inputs'])} fields, {len(form['buttons'])} buttons)"
+                nodes.append((0, f"{head} - on {component['pages']} pages"))
+                if form_mode == "full":
+                    nodes.extend(form_texts(form, form_mode)[1:])
+        for link_set in self.link_sets:
+            nodes.append((0, f"{link_set['label']}: {len(link_set['links'])} links - on {link_set['pages']} pages"))
+            nodes.extend((1, link_label(l)) for l in link_set["links"])
+        return nodes
+
+    def report(self, lines_out: int, definition_lines: int) -> str:
+        """Size summary given the converter's output line count."""
+        before = lines_out - definition_lines - self.references + self.replaced_lines
+        saved = before - lines_out
+        head = (f"[shared] {len(self.forms)} forms, {len(self.link_sets)} link sets emitted once: "
+                f"{before} -> {lines_out} lines")
+        if saved <= 0:
+            return head + " (no reduction)"
+        return head + f" ({100.0 * saved / before:.0f}% smaller)"
@@ -0,0 +1,39 @@
+"""
+Diff two crawled site maps (either crawler's schema).
+
+    {"added": [url, ...], "removed": [url, ...],
+     "changed": {url: {field: {"old": ..., "new": ...}}}}
+
+List fields that hold URLs ("links") are reported as {"added": [...], "removed": [...]}.
+"""
+
+import json
+
+
+def _plain(value):
+    # tuples (headings) and lists compare equal once both went through JSON
+    return json.loads(json.dumps(value))
+
+
+def diff_site_maps(old: dict, new: dict) -> dict:
+    old_urls, new_urls = set(old), set(new)
+    changed = {}
+    for url in sorted(old_urls & new_urls):
+        before, after = _plain(old[url]), _plain(new[url])
+        fields = {}
+        for key in sorted(set(before) | set(after)):
+            a, b = before.get(key), after.get(key)
+            if a == b:
+                continue
+            if key == "links":
+                fields[key] = {"added": sorted(set(b or []) - set(a or [])),
+                               "removed": sorted(set(a or []) - set(b or []))}
+            else:
+                fields[key] = {"old": a, "new": b}
+        if fields:
+            changed[url] = fields
+    return {
+        "added": sorted(new_urls - old_urls),
+        "removed": sorted(old_urls - new_urls),
+        "changed": changed,
+    }
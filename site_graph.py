@@ -0,0 +1,243 @@
+"""
+One site-graph model for both crawlers and every mind-map emitter.
+
+Crawlers produce two JSON shapes today:
+- Crawl_site_BeautifulSoup: {url: {"title", "headings", "links"}}
+- Crawl_site_playwright:    {url: {"title", "url", "parent", "links", "forms"}}
+
+`SiteGraph` holds either (or both) compactly:
+- every URL is interned once and referred to by an integer id
+- outgoing links live in one flat `array("I")` of target ids; each page owns a
+  (start, length) slice of it, also stored in arrays indexed by id
+- parents are an `array("i")` indexed by id (-1 = none)
+- per-page text lives in a `__slots__` `PageRecord`; repeated heading/title strings
+  and identical forms are stored once
+
+Emitters for PlantUML, Markmap, FreeMind and XMind (mindmap_export.py) and the
+LLM mind map (llm_mindmap.py) walk the graph by page id.
+"""
+
+import json
+import os
+from array import array
+
+from crawl_output import open_site_map
+
+FORMAT = "site-graph"
+VERSION = 1
+
+
+class PageRecord:
+    __slots__ = ("title", "headings", "forms")
+
+    def __init__(self, title=None, headings=(), forms=()):
+        self.title = title
+        self.headings = headings
+        self.forms = forms
+
+
+class SiteGraph:
+    def __init__(self):
+        self.urls = []          # id -> url
+        self._ids = {}          # url -> id
+        self._pages = []        # id -> PageRecord, None for linked-but-not-crawled URLs
+        self._order = array("I")        # crawled ids, in crawl order
+        self._parent = array("i")       # id -> parent id or -1
+        self._link_start = array("I")   # id -> first index into _targets
+        self._link_len = array("I")     # id -> number of links
+        self._targets = array("I")      # all link target ids, page after page
+        self._strings = {}
+        self._forms = {}
+
+    # ---------- building ----------
+    def intern(self, url: str) -> int:
+        """Id of `url`, allocating one on first sight."""
+        uid = self._ids.get(url)
+        if uid is None:
+            uid = len(self.urls)
+            self._ids[url] = uid
+            self.urls.append(url)
+            self._pages.append(None)
+            self._parent.append(-1)
+            self._link_start.append(0)
+            self._link_len.append(0)
+        return uid
+
+    def _str(self, s):
+        return s if s is None else self._strings.setdefault(s, s)
+
+    def _form(self, form: dict) -> dict:
+        key = (form.get("method"), form.get("action"),
+               tuple(tuple(inp.items()) for inp in form.get("inputs", ())), tuple(form.get("buttons", ())))
+        return self._forms.setdefault(key, form)
+
+    def add_page(self, url: str, title: str = None, headings=(), links=(), forms=(), parent: str = None) -> int:
+        """
+        Record a crawled page. Adding the same URL again (a resumed crawl re-writing a
+        page) replaces its record but keeps its position in crawl order.
+        """
+        uid = self.intern(url)
+        if self._pages[uid] is None:
+            self._order.append(uid)
+        self._pages[uid] = PageRecord(
+            self._str(title),
+            tuple((level, self._str(text)) for level, text in headings),
+            tuple(self._form(f) for f in forms),
+        )
+        self._parent[uid] = -1 if parent is None else self.intern(parent)
+        self._link_start[uid] = len(self._targets)
+        self._link_len[uid] = len(links)
+        self._targets.extend(self.intern(l) for l in links)
+        return uid
+
+    def add_record(self, url: str, page: dict, parent: str = None) -> int:
+        """`add_page` from a crawler record of either schema (`parent` if the record has none)."""
+        return self.add_page(url, title=page.get("title"), headings=page.get("headings", ()),
+                             links=page.get("links", ()), forms=page.get("forms", ()),
+                             parent=page.get("parent", parent))
+
+    def infer_parents(self) -> int:
+        """
+        Give parentless pages (except the first one crawled) the first page, in crawl
+        order, that links to them. Used for crawls that did not record parents.
+        Returns how many parents were set.
+        """
+        found, first = 0, self._order[0] if self._order else -1
+        for uid in self._order:
+            for target in self.link_ids(uid):
+                if (target != first and target != uid and self._pages[target] is not None
+                        and self._parent[target] == -1):
+                    self._parent[target] = uid
+                    found += 1
+        return found
+
+    @classmethod
+    def from_site_map(cls, site_map) -> "SiteGraph":
+        """Graph of a crawler site map (dict or JsonlSiteMap) of either schema."""
+        graph = cls()
+        has_parents = False
+        for url, page in site_map.items():
+            graph.add_record(url, page)
+            has_parents = has_parents or "parent" in page
+        if not has_parents:
+            graph.infer_parents()
+        return graph
+
+    # ---------- reading ----------
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, url) -> bool:
+        uid = self._ids.get(url)
+        return uid is not None and self._pages[uid] is not None
+
+    def __iter__(self):
+        return (self.urls[uid] for uid in self._order)
+
+    def record(self, uid: int) -> PageRecord:
+        return self._pages[uid]
+
+    def crawled_ids(self):
+        return self._order
+
+    def link_ids(self, uid: int):
+        start = self._link_start[uid]
+        return self._targets[start:start + self._link_len[uid]]
+
+    # ---------- tree ----------
+    def children_index(self) -> dict:
+        """
+        parent id -> child ids in the parent's link order. A child is a crawled page
+        whose recorded parent is a crawled page that links to it.
+        """
+        kids = {}
+        for uid in self._order:
+            pid = self._parent[uid]
+            if pid != -1 and self._pages[pid] is not None:
+                kids.setdefault(pid, set()).add(uid)
+        return {pid: [t for t in dict.fromkeys(self.link_ids(pid)) if t in ids] for pid, ids in kids.items()}
+
+    def roots(self):
+        return [uid for uid in self._order if self._parent[uid] == -1]
+
+    def walk(self, max_depth: int = None):
+        """
+        Pre-order walk of the crawl tree, iteratively. Yields `(depth, id, hidden)`
+        with depth 1 for roots; `hidden` is the number of descendants cut off below
+        this page by `max_depth` (0 otherwise).
+        """
+        children = self.children_index()
+        visited = set()
+        stack = [(uid, 1) for uid in reversed(self.roots())]
+        while stack:
+            uid, depth = stack.pop()
+            if uid in visited:
+                continue
+            visited.add(uid)
+            kids = [c for c in children.get(uid, ()) if c not in visited]
+            if max_depth is not None and depth >= max_depth and kids:
+                yield depth, uid, self._subtree_size(kids, children)
+                continue
+            yield depth, uid, 0
+            stack.extend((c, depth + 1) for c in reversed(kids))
+
+    @staticmethod
+    def _subtree_size(uids, children) -> int:
+        count, stack, seen = 0, list(uids), set()
+        while stack:
+            uid = stack.pop()
+            if uid in seen:
+                continue
+            seen.add(uid)
+            count += 1
+            stack.extend(children.get(uid, ()))
+        return count
+
+    # ---------- persistence ----------
+    def save(self, path: str):
+        """
+        JSON: the URL table once, then one row per crawled page with link and parent
+        ids. Written atomically.
+        """
+        pages = []
+        for uid in self._order:
+            rec = self._pages[uid]
+            pages.append([uid, self._parent[uid], rec.title, rec.headings, rec.forms, self.link_ids(uid).tolist()])
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"format": FORMAT, "version": VERSION, "urls": self.urls, "pages": pages},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SiteGraph":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a {FORMAT} file")
+        graph = cls()
+        for url in data["urls"]:
+            graph.intern(url)
+        for uid, pid, title, headings, forms, links in data["pages"]:
+            url = graph.urls[uid]
+            graph.add_page(url, title, [tuple(h) for h in headings], [graph.urls[t] for t in links], forms,
+                           parent=None if pid == -1 else graph.urls[pid])
+        return graph
+
+
+def is_graph_file(path: str) -> bool:
+    """True for files written by `SiteGraph.save` (checked without parsing the whole file)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            head = f.read(64)
+    except OSError:
+        return False
+    return head.startswith('{"format":"%s"' % FORMAT)
+
+
+def load_graph(path: str) -> SiteGraph:
+    """A saved graph, or the graph of a crawler .json/.jsonl site map."""
+    if is_graph_file(path):
+        return SiteGraph.load(path)
+    with open_site_map(path) as site_map:
+        return SiteGraph.from_site_map(site_map)
@@ -0,0 +1,191 @@
+"""
+Sitemap-seeded URL discovery.
+
+The sitemaps of a site are the `Sitemap:` lines of its robots.txt plus the
+conventional `/sitemap.xml`. Both `<urlset>` files and `<sitemapindex>` files
+(whose entries are more sitemaps) are read, plain or gzipped (`.xml.gz`, or
+`Content-Encoding: gzip`). Responses are streamed into `xml.etree.ElementTree.iterparse`
+and every element is cleared once read, so a sitemap of many megabytes is never
+held in memory.
+
+Sitemap requests go through robots.txt and the crawler's per-host politeness
+budget, and index entries pointing at unrelated hosts are not followed.
+
+`discover` yields `(url, lastmod)` pairs, with `lastmod` as a Unix timestamp or
+None. The crawler bulk-seeds its frontier with them and, given a response cache,
+skips pages whose `<lastmod>` is older than their last fetch.
+"""
+
+import gzip
+import logging
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import requests
+
+from robots_cache import RobotsCache
+
+log = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def parse_lastmod(value: str):
+    """W3C datetime (`2024-05-01`, `2024-05-01T10:00:00+02:00`, `...Z`) -> Unix time, or None."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        stamp = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
+
+
+def _local(tag: str) -> str:
+    """`{http://www.sitemaps.org/schemas/sitemap/0.9}loc` -> `loc`."""
+    return tag.rsplit("}", 1)[-1]
+
+
+class _Prefixed:
+    """`stream` with `head` (bytes already read from it) put back in front."""
+
+    def __init__(self, head: bytes, stream):
+        self.head = head
+        self.stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        if not self.head:
+            return self.stream.read(size)
+        if size is None or size < 0:
+            data, self.head = self.head + self.stream.read(), b""
+            return data
+        data, self.head = self.head[:size], self.head[size:]
+        return data
+
+
+def iter_entries(stream):
+    """
+    `(kind, loc, lastmod)` for each `<url>` ("url") or `<sitemap>` ("sitemap")
+    entry of a sitemap file object, plain or gzipped.
+    """
+    head = stream.read(2)
+    stream = _Prefixed(head, stream)
+    if head == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=stream)
+    events = ET.iterparse(stream, events=("start", "end"))
+    _, root = next(events)
+    loc = lastmod = None
+    for event, elem in events:
+        if event != "end":
+            continue
+        tag = _local(elem.tag)
+        if tag == "loc":
+            loc = (elem.text or "").strip()
+        elif tag == "lastmod":
+            lastmod = parse_lastmod(elem.text)
+        elif tag in ("url", "sitemap"):
+            if loc:
+                yield tag, loc, lastmod
+            loc = lastmod = None
+            root.clear()  # drop the entries read so far
+
+
+class SitemapReader:
+    """
+    Reads sitemaps over `session`. At most `max_sitemaps` files are fetched, so a
+    runaway index (or one that lists itself) cannot keep the crawl busy.
+
+    Sitemap fetches are crawl requests like any other: with `robots`, a sitemap
+    disallowed by its origin's robots.txt is skipped, and `wait(url, crawl_delay)`
+    (blocking) is called before each fetch so the crawler's per-host politeness
+    budget covers them too. Index entries are only followed on the start host and
+    on hosts that its robots.txt lists sitemaps on.
+    """
+
+    def __init__(self, session=None, timeout: float = 30, max_sitemaps: int = 1000, robots=None, wait=None):
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.max_sitemaps = max_sitemaps
+        self.robots = robots
+        self.wait = wait
+        self.sitemaps = 0     # files read
+        self.urls = 0         # page URLs yielded
+        self.errors = 0
+        self.disallowed = 0   # sitemaps skipped for robots.txt
+        self.offsite = 0      # index entries on other hosts, not followed
+
+    def read(self, sitemap_url: str, seen: set = None, hosts: set = None):
+        """
+        `(url, lastmod)` of one sitemap, following index entries depth-first. With
+        `hosts`, entries on other hosts are not followed.
+        """
+        seen = set() if seen is None else seen
+        if sitemap_url in seen or len(seen) >= self.max_sitemaps:
+            return
+        seen.add(sitemap_url)
+        crawl_delay = None
+        if self.robots is not None:
+            allowed, crawl_delay = self.robots.check(sitemap_url)
+            if not allowed:
+                self.disallowed += 1
+                log.info("[sitemap] disallowed by robots.txt: %s", sitemap_url)
+                return
+        if self.wait is not None:
+            self.wait(sitemap_url, crawl_delay)
+        try:
+            resp = self.session.get(sitemap_url, timeout=self.timeout, stream=True)
+        except requests.RequestException as e:
+            self.errors += 1
+            log.warning("[sitemap] %s unreachable (%s)", sitemap_url, e)
+            return
+        with resp:
+            if resp.status_code != 200:
+                if resp.status_code != 404:
+                    self.errors += 1
+                log.info("[sitemap] %s for %s", resp.status_code, sitemap_url)
+                return
+            self.sitemaps += 1
+            resp.raw.decode_content = True  # undo Content-Encoding; a .gz body is handled by iter_entries
+            children = []
+            try:
+                for kind, loc, lastmod in iter_entries(resp.raw):
+                    if kind != "sitemap":
+                        self.urls += 1
+                        yield loc, lastmod
+                    elif hosts is None or urlparse(loc).netloc in hosts:
+                        children.append(loc)  # read after this response is closed
+                    else:
+                        self.offsite += 1
+                        log.info("[sitemap] not following %s (other host)", loc)
+            except (ET.ParseError, OSError, EOFError) as e:
+                self.errors += 1
+                log.warning("[sitemap] %s is not a readable sitemap (%s)", sitemap_url, e)
+        if children:
+            log.info("[sitemap] read %s (%s sitemaps)", sitemap_url, len(children))
+        else:
+            log.info("[sitemap] read %s", sitemap_url)
+        for child in children:
+            yield from self.read(child, seen, hosts)
+
+    def discover(self, start_url: str):
+        """`(url, lastmod)` from every sitemap of `start_url`'s origin (see module docstring)."""
+        origin = RobotsCache.origin(start_url)
+        candidates = list(self.robots.sitemaps(start_url)) if self.robots is not None else []
+        default = origin + "/sitemap.xml"
+        if default not in candidates:
+            candidates.append(default)
+        # robots.txt may point at sitemaps hosted elsewhere (a CDN); nothing else may
+        hosts = {urlparse(start_url).netloc} | {urlparse(url).netloc for url in candidates}
+        seen = set()
+        for sitemap_url in candidates:
+            yield from self.read(sitemap_url, seen, hosts)
+
+    def stats(self) -> dict:
+        return {"sitemaps": self.sitemaps, "urls": self.urls, "errors": self.errors,
+                "disallowed": self.disallowed, "offsite": self.offsite}